@@ -0,0 +1,207 @@
+"""
+Benchmarks of the pipeline stages on synthetic Tockler exports.
+
+Every size is generated with scientist_types.synthetic, after which the
+stages of the app are timed: parsing, merging the work slots, the day
+features, the correlations, the scientist type rules, the rolling
+correlations and building the charts. Run from the root of the repository:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes week year --events-per-day 500 --delimiter ';'
+
+Each run is saved as JSON in benchmarks/results/ and compared with the
+previous run, so regressions show up as stages that got slower.
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from scientist_types.batch import analyze_data
+from scientist_types.charts import box_plot_summary, melt_variables
+from scientist_types.ingest import load_survey_data
+from scientist_types.profiling import Profiler
+from scientist_types.stats import TARGET_COLUMNS, merge_survey, rolling_correlations
+from scientist_types.synthetic import generate_awt_data, generate_survey_data, to_csv_bytes
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Number of days of each size
+SIZES = {
+    'week': 7,
+    'month': 30,
+    'quarter': 91,
+    'year': 365,
+    'three-years': 1095,
+}
+
+# Stages that are this much slower than in the previous run are reported
+REGRESSION_THRESHOLD = 1.2
+
+# Number of variables plotted, like the significant variables in the app
+CHART_VARIABLES = 10
+
+
+def build_charts(merged_dataframe, variables):
+    """
+    The box plots, scatterplots and correlation heatmap of the app, as Vega-Lite specs.
+    """
+    summary, outliers = box_plot_summary(merged_dataframe, variables)
+    points = melt_variables(merged_dataframe, variables)
+    box_plots = alt.vconcat(*[
+        alt.Chart(summary).transform_filter(alt.datum.Variable == variable).mark_bar().encode(
+            x='Productivity:O', y='Q1:Q', y2='Q3:Q'
+        ) + alt.Chart(outliers).transform_filter(alt.datum.Variable == variable).mark_point().encode(
+            x='Productivity:O', y='Value:Q'
+        )
+        for variable in variables
+    ])
+    scatterplots = alt.vconcat(*[
+        alt.Chart(points).transform_filter(alt.datum.Variable == variable).mark_point().encode(
+            x='Productivity:Q', y='Value:Q'
+        )
+        for variable in variables
+    ])
+
+    correlation_matrix = merged_dataframe[TARGET_COLUMNS + list(variables)].corr().loc[list(variables), TARGET_COLUMNS]
+    correlation_df = correlation_matrix.reset_index(names='Row').melt(id_vars='Row', var_name='Column', value_name='Correlation')
+    heatmap = alt.Chart(correlation_df).mark_rect().encode(x='Column:O', y='Row:O', color='Correlation:Q')
+
+    return [chart.to_dict() for chart in (box_plots, scatterplots, heatmap)]
+
+
+def benchmark_size(days, events_per_day, apps, titles, delimiter, repeat, trace_memory, seed=0):
+    """
+    Time the stages on one synthetic export. Returns a row per stage with the
+    fastest time of the repeats.
+    """
+    dataframe_awt = generate_awt_data(days=days, events_per_day=events_per_day, apps=apps, titles=titles, seed=seed)
+    dataframe_survey = generate_survey_data(dataframe_awt, seed=seed)
+    awt_bytes = to_csv_bytes(dataframe_awt, delimiter)
+    survey_bytes = to_csv_bytes(dataframe_survey, ';')
+
+    runs = []
+    for _ in range(repeat):
+        profiler = Profiler(trace_memory=trace_memory)
+        # The delimiter is detected, as in the app
+        results = analyze_data(awt_bytes, survey_bytes, profiler=profiler)
+
+        merged_dataframe = merge_survey(results['days'], load_survey_data(survey_bytes))
+        variables = results['correlations']['Variable']
+        variables = [variable for variable in variables if variable not in TARGET_COLUMNS][:CHART_VARIABLES]
+        with profiler.stage('Rolling correlations', rows_in=len(merged_dataframe)) as stage:
+            stage['rows_out'] = len(rolling_correlations(merged_dataframe))
+        with profiler.stage('Charts', rows_in=len(merged_dataframe)):
+            build_charts(merged_dataframe, variables)
+
+        runs.append(pd.DataFrame(profiler.records))
+
+    timings = pd.concat(runs).groupby('stage', sort=False).agg('min').reset_index()
+    timings.insert(0, 'events', len(dataframe_awt))
+    timings.insert(0, 'days', days)
+    return timings
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def latest_results(results_dir):
+    paths = sorted(glob.glob(os.path.join(results_dir, '*.json')))
+    if not paths:
+        return None
+    with open(paths[-1]) as file:
+        return json.load(file)
+
+
+def compare(current, previous, threshold=REGRESSION_THRESHOLD):
+    """
+    Join the timings of two runs on size and stage, with the ratio of the
+    current to the previous time.
+    """
+    keys = ['size', 'stage']
+    comparison = pd.DataFrame(current['results'])[keys + ['seconds']].merge(
+        pd.DataFrame(previous['results'])[keys + ['seconds']], on=keys, how='left', suffixes=('', '_previous')
+    )
+    comparison['ratio'] = comparison['seconds'] / comparison['seconds_previous']
+    comparison['regression'] = comparison['ratio'] > threshold
+    return comparison
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description='Time the pipeline stages on synthetic Tockler data.')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['week', 'month', 'year'], help='sizes to benchmark (default: week month year)')
+    parser.add_argument('--events-per-day', type=int, default=300, help='average windows per working day (default: 300)')
+    parser.add_argument('--apps', type=int, default=20, help='number of distinct apps (default: 20)')
+    parser.add_argument('--titles', type=int, default=500, help='number of distinct window titles (default: 500)')
+    parser.add_argument('--delimiter', default=',', help='delimiter of the AWT file (default: ,)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per size; the fastest is kept (default: 3)')
+    parser.add_argument('--memory', action='store_true', help='also measure the peak memory of each stage (slower)')
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help='where the results are saved and compared')
+    parser.add_argument('--compare', help='results file to compare with (default: the latest in the results directory)')
+    parser.add_argument('--no-save', action='store_true', help='do not save the results of this run')
+    args = parser.parse_args(argv)
+
+    frames = []
+    for size in args.sizes:
+        print(f'Benchmarking {size} ({SIZES[size]} days)...', file=sys.stderr)
+        timings = benchmark_size(
+            SIZES[size], args.events_per_day, args.apps, args.titles, args.delimiter, args.repeat, args.memory
+        )
+        frames.append(timings.assign(size=size))
+    results = pd.concat(frames, ignore_index=True)
+    results = results[['size'] + [column for column in results.columns if column != 'size']]
+
+    current = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'options': {key: value for key, value in vars(args).items() if key not in ('results_dir', 'compare', 'no_save')},
+        'results': json.loads(results.to_json(orient='records')),
+    }
+
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    else:
+        previous = latest_results(args.results_dir)
+
+    with pd.option_context('display.width', 120, 'display.max_columns', None):
+        if previous is None:
+            print(results.to_string(index=False))
+        else:
+            comparison = compare(current, previous)
+            print(f"Compared with {previous['created']} ({previous.get('commit') or 'unknown commit'}):")
+            if previous.get('options') != current['options']:
+                print('Note: the previous run used different options, so the timings may not be comparable.')
+            print(comparison.to_string(index=False))
+            for row in comparison[comparison['regression']].itertuples():
+                print(f'Slower: {row.stage} on {row.size} ({row.ratio:.2f}x)', file=sys.stderr)
+
+    if not args.no_save:
+        os.makedirs(args.results_dir, exist_ok=True)
+        path = os.path.join(args.results_dir, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+        with open(path, 'w') as file:
+            json.dump(current, file, indent=2)
+        print(f'Saved to {path}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""
+Data processing for the Productivity Analysis app.
+
+The Streamlit script (streamlit_app.py) handles uploads and rendering; the
+modules in this package hold the pandas/NumPy logic so it can be reused and
+profiled outside of a browser session.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from scientist_types.batch import main
+
+sys.exit(main())
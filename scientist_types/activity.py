@@ -0,0 +1,151 @@
+"""
+A day x time bucket x app matrix of the AWT activity.
+
+The matrix holds the seconds every app was active in every time bucket (5
+minutes by default) of every day. It is built once from the events, after
+which questions about activity by time of day are answered from the matrix
+in O(days x buckets) instead of going over the events again.
+
+Events are attributed to the day of their Begin, like the other per-day
+features, so an event running past midnight counts towards the last
+buckets of its day.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from scientist_types.intervals import normalize_intervals
+
+# Length of a time bucket
+BUCKET_MINUTES = 5
+
+# Hours of the day (from, to) that count as the morning and the afternoon
+MORNING_HOURS = (6, 12)
+AFTERNOON_HOURS = (12, 18)
+
+
+class ActivityMatrix:
+    """
+    Seconds of activity per day, time bucket and app.
+
+    seconds is a float array of shape (days, buckets per day) with the
+    active seconds of every bucket, in which overlapping windows (e.g. on
+    several monitors) count once. app_seconds_per_bucket is a sparse matrix
+    with a row per day and app (day * apps + app) and a column per bucket,
+    holding only the buckets in which an app was used. days and apps are the
+    labels of the days and apps. Even with thousands of apps, the matrix
+    takes about as much memory as the events themselves.
+    """
+
+    def __init__(self, seconds, app_seconds_per_bucket, days, apps, bucket_minutes=BUCKET_MINUTES):
+        self.seconds = seconds
+        self.app_seconds_per_bucket = app_seconds_per_bucket
+        self.days = days
+        self.apps = apps
+        self.bucket_minutes = bucket_minutes
+
+    @property
+    def bucket_hours(self):
+        """
+        The time of day at which every bucket starts, in decimal hours.
+        """
+        return np.arange(self.seconds.shape[1]) * self.bucket_minutes / 60
+
+    def app_seconds(self, app=None):
+        """
+        Seconds per day and app, as a DataFrame indexed by Date. With app,
+        the seconds of that app per day and bucket instead, as a days x
+        buckets array.
+        """
+        if app is not None:
+            rows = np.arange(len(self.days)) * len(self.apps) + self.apps.get_loc(app)
+            return self.app_seconds_per_bucket[rows].toarray()
+        per_day = np.asarray(self.app_seconds_per_bucket.sum(axis=1)).reshape(len(self.days), len(self.apps))
+        return pd.DataFrame(per_day, index=self.days, columns=self.apps)
+
+    def share_between(self, start_hour, end_hour):
+        """
+        Share of the active time of every day that fell from start_hour up
+        to end_hour, as a Series indexed by Date.
+        """
+        in_range = (self.bucket_hours >= start_hour) & (self.bucket_hours < end_hour)
+        total = self.seconds.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = self.seconds[:, in_range].sum(axis=1) / total
+        return pd.Series(share, index=self.days)
+
+
+def _split_into_buckets(begin, end, bucket_seconds):
+    """
+    Split intervals, given in seconds since a midnight, at the bucket
+    boundaries they span. Returns the interval, the bucket (counted from that
+    midnight) and the seconds of every piece.
+    """
+    valid = end > begin
+    intervals = np.flatnonzero(valid)
+    begin, end = begin[valid], end[valid]
+
+    # The buckets from the first to the last one that each interval overlaps
+    first = (begin // bucket_seconds).astype(np.int64)
+    last = np.maximum(np.ceil(end / bucket_seconds).astype(np.int64) - 1, first)
+    pieces = last - first + 1
+
+    piece = np.repeat(np.arange(len(first)), pieces)
+    bucket = first[piece] + np.arange(len(piece)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    seconds = np.minimum(end[piece], (bucket + 1) * bucket_seconds) - np.maximum(begin[piece], bucket * bucket_seconds)
+    return intervals[piece], bucket, seconds
+
+
+def build_activity_matrix(dataframe_awt, bucket_minutes=BUCKET_MINUTES):
+    """
+    Build the ActivityMatrix of the prepared AWT events (see
+    features.prepare_awt_events).
+
+    Every event is split at the bucket boundaries it spans, after which the
+    pieces are added to their cells in one go. The active seconds come from
+    the normalized timeline of the events (see intervals.normalize_intervals),
+    so time in overlapping windows counts once.
+    """
+    bucket_seconds = bucket_minutes * 60
+    buckets_per_day = 24 * 3600 // bucket_seconds
+
+    day_codes, days = pd.factorize(dataframe_awt['Date'], sort=True)
+    app_codes, apps = pd.factorize(dataframe_awt['App'], sort=True)
+    days = pd.DatetimeIndex(days, name='Date')
+    if len(days) == 0:
+        return ActivityMatrix(
+            np.zeros((0, buckets_per_day)), sparse.csr_array((0, buckets_per_day)), days, pd.Index(apps, name='App'), bucket_minutes
+        )
+
+    # Events end at the end of their day at the latest, so every piece of time
+    # after a midnight belongs to events of the next day
+    begin = dataframe_awt['Begin']
+    end = np.minimum(dataframe_awt['End'], dataframe_awt['Date'] + pd.Timedelta(days=1))
+    valid = (day_codes >= 0) & (app_codes >= 0)
+    begin, end, day_codes, app_codes = begin[valid], end[valid], day_codes[valid], app_codes[valid]
+
+    # Buckets are counted from the first midnight, so day boundaries are bucket boundaries
+    origin = days[0].to_datetime64()
+    day_positions = np.full((days[-1] - days[0]).days + 2, -1)
+    day_positions[(days - days[0]).days] = np.arange(len(days))
+
+    def seconds_since_origin(timestamps):
+        return (np.asarray(timestamps, dtype='datetime64[ns]') - origin) / np.timedelta64(1, 's')
+
+    # The active seconds per bucket, from the blocks of overlapping events
+    block_begin, block_end, _ = normalize_intervals(begin, end)
+    _, cells, piece_seconds = _split_into_buckets(seconds_since_origin(block_begin), seconds_since_origin(block_end), bucket_seconds)
+    rows = day_positions[cells // buckets_per_day]
+    active = np.bincount(
+        rows * buckets_per_day + cells % buckets_per_day, weights=piece_seconds, minlength=len(days) * buckets_per_day
+    ).reshape(len(days), buckets_per_day)
+
+    # The seconds per app and bucket, only for the buckets in which the app was used
+    events, cells, piece_seconds = _split_into_buckets(seconds_since_origin(begin), seconds_since_origin(end), bucket_seconds)
+    app_seconds_per_bucket = sparse.csr_array(
+        (piece_seconds, (day_codes[events] * len(apps) + app_codes[events], cells % buckets_per_day)),
+        shape=(len(days) * len(apps), buckets_per_day)
+    )
+    app_seconds_per_bucket.sum_duplicates()
+    return ActivityMatrix(active, app_seconds_per_bucket, days, pd.Index(apps, name='App'), bucket_minutes)
@@ -0,0 +1,197 @@
+"""
+Headless processing of many participants at once.
+
+The input directory holds, for every participant, a Tockler export named
+<participant>_awt.csv and survey results named <participant>_survey.csv.
+Participants are processed in parallel, one worker process per core, and
+their results are combined into tables with a Participant column:
+
+    python -m scientist_types <input_dir> <output_dir> [--tolerance 60]
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from scientist_types.features import build_dataframe_days, limit_app_columns, prepare_awt_events
+from scientist_types.ingest import load_awt_files, load_survey_data
+from scientist_types.profiling import Profiler
+from scientist_types.rules import REFERENCED_APPS, SCIENTIST_TYPES, score_scientist_types
+from scientist_types.slots import build_work_slots
+from scientist_types.stats import correlate_with_survey, merge_survey
+from scientist_types.titles import read_title_rules
+
+AWT_SUFFIX = '_awt.csv'
+SURVEY_SUFFIX = '_survey.csv'
+
+
+def find_participants(input_dir):
+    """
+    Map every participant with both an AWT and a survey file in input_dir to
+    the paths of those files.
+    """
+    names = set(os.listdir(input_dir))
+    participants = {}
+    for name in sorted(names):
+        if name.endswith(AWT_SUFFIX):
+            participant = name[:-len(AWT_SUFFIX)]
+            if participant + SURVEY_SUFFIX in names:
+                participants[participant] = (
+                    os.path.join(input_dir, name),
+                    os.path.join(input_dir, participant + SURVEY_SUFFIX),
+                )
+    return participants
+
+
+def analyze_data(awt_bytes, survey_bytes, delimiter=None, tolerance=0, method='pearson', max_apps=50, keep=REFERENCED_APPS,
+                 significance='t-test', resample_workers=None, title_rules=None, profiler=None):
+    """
+    Run the full analysis on the contents of an AWT and a survey file.
+    awt_bytes may also be a list of (name, bytes) pairs of several AWT
+    exports or ZIP archives of them.
+
+    Returns a dict with the per-day features ('days'), the correlations
+    with the survey scores ('correlations') and the scientist type scores
+    ('scores'). significance is the test behind the significance labels
+    ('t-test', 'bootstrap' or 'permutation'); the resampling tests run in
+    resample_workers processes. Titles are normalized and classified with
+    title_rules (see titles.TitleRules). The stages are measured by
+    profiler, if given.
+    """
+    profiler = profiler or Profiler(enabled=False)
+
+    with profiler.stage('Parse AWT data') as stage:
+        dataframe_awt = load_awt_files(awt_bytes, delimiter=delimiter, title_rules=title_rules)
+        stage['rows_out'] = len(dataframe_awt)
+    with profiler.stage('Parse survey results') as stage:
+        dataframe_survey = load_survey_data(survey_bytes)
+        stage['rows_out'] = len(dataframe_survey)
+
+    with profiler.stage('Merge work slots', rows_in=len(dataframe_awt)) as stage:
+        dataframe_merged_awt = build_work_slots(dataframe_awt, tolerance=tolerance)
+        stage['rows_out'] = len(dataframe_merged_awt)
+    with profiler.stage('Day features', rows_in=len(dataframe_awt)) as stage:
+        dataframe_days = build_dataframe_days(prepare_awt_events(dataframe_awt), dataframe_merged_awt)
+        dataframe_days = limit_app_columns(dataframe_days, max_apps, keep=keep)
+        stage['rows_out'] = len(dataframe_days)
+
+    with profiler.stage('Correlations', rows_in=len(dataframe_days)) as stage:
+        merged_dataframe = merge_survey(dataframe_days, dataframe_survey)
+        productivity_results = correlate_with_survey(
+            merged_dataframe, method=method, significance=significance, workers=resample_workers
+        )
+        stage['rows_out'] = len(productivity_results)
+    with profiler.stage('Scientist type rules', rows_in=len(productivity_results)) as stage:
+        scientist_type_scores = score_scientist_types(productivity_results)
+        stage['rows_out'] = len(scientist_type_scores)
+
+    return {
+        'days': dataframe_days,
+        'correlations': productivity_results,
+        'scores': scientist_type_scores,
+    }
+
+
+def analyze_participant(awt_path, survey_path, **options):
+    """
+    Run the full analysis for one participant, see analyze_data.
+    """
+    with open(awt_path, 'rb') as file:
+        awt_bytes = file.read()
+    with open(survey_path, 'rb') as file:
+        survey_bytes = file.read()
+    return analyze_data(awt_bytes, survey_bytes, **options)
+
+
+def _analyze_safely(participant, paths, options):
+    # Runs in a worker process; errors are reported instead of stopping the batch
+    try:
+        return participant, analyze_participant(*paths, **options), None
+    except Exception as e:
+        return participant, None, f'{type(e).__name__}: {e}'
+
+
+def run_batch(input_dir, workers=None, **options):
+    """
+    Analyze all participants in input_dir in a process pool.
+
+    Options are passed on to analyze_participant. Returns a dict of combined
+    tables: 'days', 'correlations' and 'scores' with a leading Participant
+    column, a 'summary' with one row of type scores per participant, and
+    'errors' for the participants that could not be processed.
+    """
+    participants = find_participants(input_dir)
+    results = {}
+    # The participants already use all workers, so resampling tests run in their own process
+    options.setdefault('resample_workers', 1)
+    errors = []
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(_analyze_safely, participant, paths, options)
+            for participant, paths in participants.items()
+        ]
+        for future in futures:
+            participant, result, error = future.result()
+            if error is None:
+                results[participant] = result
+            else:
+                errors.append({'Participant': participant, 'Error': error})
+
+    combined = {}
+    for table in ('days', 'correlations', 'scores'):
+        frames = [result[table].assign(Participant=participant) for participant, result in results.items()]
+        combined[table] = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['Participant'])
+        combined[table] = combined[table][['Participant'] + [column for column in combined[table].columns if column != 'Participant']]
+
+    if results:
+        combined['summary'] = (
+            combined['scores'].pivot(index='Participant', columns='Scientist Type', values='Score')
+            .reindex(columns=SCIENTIST_TYPES)
+            .reset_index()
+        )
+    else:
+        combined['summary'] = pd.DataFrame(columns=['Participant'])
+    combined['errors'] = pd.DataFrame(errors, columns=['Participant', 'Error'])
+    return combined
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m scientist_types',
+        description='Compute the productivity analysis for every participant in a directory.'
+    )
+    parser.add_argument('input_dir', help=f'directory with <participant>{AWT_SUFFIX} and <participant>{SURVEY_SUFFIX} files')
+    parser.add_argument('output_dir', help='directory to write the combined CSV tables to')
+    parser.add_argument('--delimiter', default=None, help='delimiter of the AWT files (default: detected per file)')
+    parser.add_argument('--tolerance', type=float, default=0, help='maximum gap in seconds to merge windows into one work slot')
+    parser.add_argument('--method', choices=['pearson', 'spearman'], default='pearson', help='correlation method')
+    parser.add_argument('--significance', choices=['t-test', 'bootstrap', 'permutation'], default='t-test', help='test behind the significance labels')
+    parser.add_argument('--title-rules', help='JSON file with the rules to normalize and classify window titles (default: built-in rules)')
+    parser.add_argument('--max-apps', type=int, default=50, help='number of apps analysed separately')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: one per core)')
+    args = parser.parse_args(argv)
+
+    combined = run_batch(
+        args.input_dir,
+        workers=args.workers,
+        delimiter=args.delimiter,
+        tolerance=args.tolerance,
+        method=args.method,
+        significance=args.significance,
+        max_apps=args.max_apps,
+        title_rules=read_title_rules(args.title_rules) if args.title_rules else None,
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for table, dataframe in combined.items():
+        if table != 'errors' or not dataframe.empty:
+            dataframe.to_csv(os.path.join(args.output_dir, f'{table}.csv'), index=False)
+
+    for error in combined['errors'].itertuples():
+        print(f'{error.Participant}: {error.Error}', file=sys.stderr)
+    print(f"Processed {len(combined['summary'])} participants, {len(combined['errors'])} failed.")
+    return 1 if not combined['errors'].empty else 0
@@ -0,0 +1,46 @@
+"""
+Chart data for the plots of the Productivity Analysis app.
+
+The charts only get the columns they plot, in long format (one row per day
+and variable), so all charts of a page can share one small data set.
+"""
+
+# Whiskers of the box plots reach the furthest values within this many
+# interquartile ranges from the box, the same as Vega-Lite's box plots
+WHISKER_EXTENT = 1.5
+
+
+def melt_variables(data, variables, by='Productivity'):
+    """
+    Long format of the variables against the by column, with the columns
+    by, Variable and Value. Missing values are dropped.
+    """
+    long = data.melt(id_vars=[by], value_vars=list(variables), var_name='Variable', value_name='Value')
+    return long.dropna(subset=[by, 'Value']).reset_index(drop=True)
+
+
+def box_plot_summary(data, variables, by='Productivity'):
+    """
+    Box plot statistics of the variables per value of the by column.
+
+    Returns the summary, with the columns by, Variable, Lower, Q1, Median, Q3
+    and Upper, and the outliers beyond the whiskers in long format.
+    """
+    long = melt_variables(data, variables, by)
+    grouped = long.groupby(['Variable', by])['Value']
+
+    summary = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    summary.columns = ['Q1', 'Median', 'Q3']
+    summary = summary.reset_index()
+
+    # Compare each value with the whisker limits of its box
+    limits = long.merge(summary, on=['Variable', by], how='left')
+    extent = WHISKER_EXTENT * (limits['Q3'] - limits['Q1'])
+    within = limits['Value'].between(limits['Q1'] - extent, limits['Q3'] + extent)
+
+    whiskers = long[within].groupby(['Variable', by])['Value'].agg(Lower='min', Upper='max').reset_index()
+    summary = summary.merge(whiskers, on=['Variable', by], how='left')
+    summary = summary[['Variable', by, 'Lower', 'Q1', 'Median', 'Q3', 'Upper']]
+
+    outliers = long[~within].reset_index(drop=True)
+    return summary, outliers
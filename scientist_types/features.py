@@ -0,0 +1,271 @@
+"""
+Per-day features derived from the AWT events and the merged work slots.
+"""
+
+from collections import namedtuple
+
+import pandas as pd
+
+from scientist_types.activity import AFTERNOON_HOURS, MORNING_HOURS, build_activity_matrix
+from scientist_types.intervals import build_timeline
+from scientist_types.timeofday import decimal_hours, midpoint
+
+# Blocks of uninterrupted activity of at least this length count as focus blocks
+FOCUS_BLOCK_MINUTES = 25
+
+# Breaks of at most this length count as interruptions
+INTERRUPTION_MAX_MINUTES = 5
+
+
+def _label_of_max(values):
+    # values is indexed by (Date, label); return the label with the highest value
+    return values.idxmax()[-1]
+
+
+def _share_of_max(counts):
+    return counts.max() / counts.sum()
+
+
+# A per-day feature. Aggregated features take `column` of their source frame
+# and reduce it per day with `aggregation` (anything groupby.agg accepts).
+# Derived features have no column and compute their values from the
+# dataframe_days built so far (indexed by Date). Activity features have no column either
+# and read their values per day from the ActivityMatrix. The names of 'apps' and
+# 'categories' features are templates that are filled in with every app or category.
+Feature = namedtuple('Feature', ['name', 'source', 'column', 'aggregation'])
+
+# The per-day features, in the order of the columns of dataframe_days.
+# Sources:
+#   events       the AWT events
+#   titles       the AWT events per day and title (Count and Duration)
+#   apps         the AWT events per day and app
+#   categories   the AWT events per day and activity category of their title (see titles.TitleRules)
+#   slots        the merged work slots
+#   timeline     the blocks of activity of the normalized timeline (see prepare_timeline)
+#   breaks       the blocks of the timeline that follow a break
+#   slot_titles  the work slots per day and most occurring title (Count)
+#   activity     the seconds of activity per day, time bucket and app (see activity.ActivityMatrix)
+DAY_FEATURES = [
+    Feature('Duration', 'events', 'Duration', 'sum'),
+    Feature('Total Time Spent (hours)', 'derived', None, lambda days: days['Duration'] / 3600),
+    Feature('Start Time', 'events', 'Begin', 'min'),
+    Feature('End Time', 'events', 'End', 'max'),
+    Feature('Start Time (Decimal)', 'derived', None, lambda days: decimal_hours(days['Start Time'], days.index)),
+    Feature('End Time (Decimal)', 'derived', None, lambda days: decimal_hours(days['End Time'], days.index)),
+    Feature('Title_count', 'events', 'Title', 'size'),
+    Feature('Unique Titles', 'events', 'Title', 'nunique'),
+    Feature('Share of Unique Titles', 'derived', None, lambda days: days['Unique Titles'] / days['Title_count']),
+    Feature('Title count per hour on computer', 'derived', None, lambda days: days['Title_count'] / days['Total Time Spent (hours)']),
+    Feature('Most Frequent Title', 'titles', 'Count', _label_of_max),
+    Feature('Title with Longest Duration', 'titles', 'Duration', _label_of_max),
+    Feature('Duration of Longest Title', 'titles', 'Duration', 'max'),
+    Feature('Time in {}', 'apps', 'Duration', 'sum'),
+    Feature('Count of {}', 'apps', 'Duration', 'count'),
+    Feature('Time on {}', 'categories', 'Duration', 'sum'),
+    Feature('Median Time of Day', 'slots', 'Midpoint_Hours', 'median'),
+    Feature('Total Work Slots', 'slots', 'Duration', 'size'),
+    Feature('Average Work Slot Duration', 'slots', 'Duration', 'mean'),
+    Feature('Total Breaks', 'breaks', 'Break Duration', 'size'),
+    Feature('Average Break Duration', 'breaks', 'Break Duration', 'mean'),
+    Feature('Relative break time', 'derived', None, lambda days: days['Average Break Duration'] / days['Duration']),
+    Feature('Share of Work Slots with Most Frequent Title', 'slot_titles', 'Count', _share_of_max),
+    Feature('Active Time (hours)', 'timeline', 'Hours', 'sum'),
+    Feature('Idle Time (hours)', 'timeline', 'Break Hours', 'sum'),
+    Feature('Total Focus Blocks', 'timeline', 'Focus', 'sum'),
+    Feature('Focus Time (hours)', 'timeline', 'Focus Hours', 'sum'),
+    Feature('Interruptions', 'timeline', 'Interruption', 'sum'),
+    Feature('Share of Time in Morning', 'activity', None, lambda activity: activity.share_between(*MORNING_HOURS)),
+    Feature('Share of Time in Afternoon', 'activity', None, lambda activity: activity.share_between(*AFTERNOON_HOURS)),
+]
+
+
+def prepare_awt_events(dataframe_awt):
+    """
+    Add Duration (in seconds) and Date columns to the cleaned AWT events.
+    """
+    dataframe_awt = dataframe_awt.copy()
+
+    # Calculate the duration (End - Begin) in seconds
+    dataframe_awt['Duration'] = (dataframe_awt['End'] - dataframe_awt['Begin']).dt.total_seconds()
+
+    # Extract the date from the Begin column
+    dataframe_awt['Date'] = dataframe_awt['Begin'].dt.normalize()
+
+    return dataframe_awt
+
+
+def prepare_work_slots(dataframe_merged_awt):
+    """
+    Add Duration, Date and midpoint columns to the merged work slots.
+    """
+    dataframe_merged_awt = dataframe_merged_awt.copy()
+
+    # Calculate the duration (End - Begin) in seconds
+    dataframe_merged_awt['Duration'] = (dataframe_merged_awt['End'] - dataframe_merged_awt['Begin']).dt.total_seconds()
+
+    # Extract the date from the Begin column
+    dataframe_merged_awt['Date'] = dataframe_merged_awt['Begin'].dt.normalize()
+
+    # Calculate the midpoint of each work slot
+    dataframe_merged_awt['Midpoint'] = midpoint(dataframe_merged_awt['Begin'], dataframe_merged_awt['End'])
+
+    # Convert the midpoint to decimal hours since the midnight starting the slot's day
+    dataframe_merged_awt['Midpoint_Hours'] = decimal_hours(dataframe_merged_awt['Midpoint'], dataframe_merged_awt['Date'])
+
+    return dataframe_merged_awt
+
+
+def prepare_timeline(dataframe_merged_awt):
+    """
+    The timeline of the work slots with overlaps merged (see build_timeline),
+    with the hours of activity and breaks, focus blocks and interruptions
+    of every block.
+    """
+    timeline = build_timeline(dataframe_merged_awt['Begin'], dataframe_merged_awt['End'])
+    timeline['Hours'] = timeline['Duration'] / 3600
+    timeline['Break Hours'] = timeline['Break Duration'].fillna(0) / 3600
+    timeline['Focus'] = timeline['Duration'] >= FOCUS_BLOCK_MINUTES * 60
+    timeline['Focus Hours'] = timeline['Hours'].where(timeline['Focus'], 0)
+    timeline['Interruption'] = timeline['Break Duration'] <= INTERRUPTION_MAX_MINUTES * 60
+    return timeline
+
+
+def _aggregate_pivots(dataframe_awt, column, features, observed=True):
+    # One groupby over (Date, column) for all features, pivoted to a column per value.
+    # Unless observed, every category of a categorical column gets a column
+    aggregated = dataframe_awt.groupby(['Date', column], observed=observed)['Duration'].agg([feature.aggregation for feature in features])
+
+    pivots = {}
+    for feature in features:
+        pivot = aggregated[feature.aggregation].unstack(column, fill_value=0)
+        pivot.columns = [feature.name.format(value) for value in pivot.columns]
+        pivots[feature.name] = pivot
+    return pivots
+
+
+def build_dataframe_days(dataframe_awt, dataframe_merged_awt, features=DAY_FEATURES, activity=None):
+    """
+    Build the per-day AWT features from the prepared events (see
+    prepare_awt_events) and the merged work slots.
+
+    Each source frame is grouped and aggregated once for all of its
+    features, after which the derived features are computed in order.
+    The activity features are read from activity, the ActivityMatrix of the
+    events, which is built from the events if not given.
+    """
+    dataframe_slots = prepare_work_slots(dataframe_merged_awt)
+    timeline = prepare_timeline(dataframe_merged_awt)
+
+    # The frames the aggregated features are computed from, grouped by day
+    sources = {
+        'events': dataframe_awt.groupby('Date'),
+        'titles': dataframe_awt.groupby(['Date', 'Title'], observed=True)['Duration'].agg(Count='size', Duration='sum').groupby(level='Date'),
+        'slots': dataframe_slots.groupby('Date'),
+        'timeline': timeline.groupby('Date'),
+        # The gaps between the blocks of a day are its breaks
+        'breaks': timeline[timeline['Break Duration'].notna()].groupby('Date'),
+        'slot_titles': dataframe_slots.groupby(['Date', 'Most_occuring_title'], observed=True).size().to_frame('Count').groupby(level='Date'),
+    }
+
+    # Aggregate every source in a single pass
+    aggregated = []
+    for source, grouped in sources.items():
+        aggregations = {feature.name: (feature.column, feature.aggregation) for feature in features if feature.source == source}
+        if aggregations:
+            aggregated.append(grouped.agg(**aggregations))
+
+    # The matrix is built once and read by all activity features
+    activity_features = [feature for feature in features if feature.source == 'activity']
+    if activity_features:
+        if activity is None:
+            activity = build_activity_matrix(dataframe_awt)
+        aggregated.append(pd.DataFrame({feature.name: feature.aggregation(activity) for feature in activity_features}))
+
+    app_features = [feature for feature in features if feature.source == 'apps']
+    pivots = _aggregate_pivots(dataframe_awt, 'App', app_features) if app_features else {}
+
+    # The same categories for every part of the events, so that the parts have the same columns
+    category_features = [feature for feature in features if feature.source == 'categories']
+    if category_features and 'Category' in dataframe_awt.columns:
+        pivots.update(_aggregate_pivots(dataframe_awt, 'Category', category_features, observed=False))
+
+    # Align everything on the days of the AWT events; a day without events of an app or
+    # category spent no time on it
+    days_index = pd.Index(dataframe_awt['Date'].drop_duplicates().sort_values(), name='Date')
+    dataframe_days = pd.concat(
+        [frame.reindex(days_index) for frame in aggregated]
+        + [pivot.reindex(days_index, fill_value=0) for pivot in pivots.values()],
+        axis=1
+    )
+
+    # Compute the derived features from the aggregated ones
+    for feature in features:
+        if feature.source == 'derived':
+            dataframe_days[feature.name] = feature.aggregation(dataframe_days)
+
+    # Order the columns as listed in the features
+    columns = []
+    for feature in features:
+        if feature.source in ('apps', 'categories'):
+            if feature.name in pivots:
+                columns.extend(pivots[feature.name].columns)
+        else:
+            columns.append(feature.name)
+
+    dataframe_days = dataframe_days[columns]
+    return dataframe_days.reset_index()
+
+
+def app_columns(dataframe_days, prefix):
+    """
+    Map the app names to the dataframe_days columns with the given prefix.
+    """
+    return {column[len(prefix):]: column for column in dataframe_days.columns if column.startswith(prefix)}
+
+
+def limit_app_columns(dataframe_days, max_apps, keep=()):
+    """
+    Keep the 'Time in'/'Count of' columns of the max_apps apps with the most
+    time spent (plus the apps in keep) and fold all other apps into 'Other
+    apps' columns.
+    """
+    time_columns = app_columns(dataframe_days, 'Time in ')
+    count_columns = app_columns(dataframe_days, 'Count of ')
+    if len(time_columns) <= max_apps:
+        return dataframe_days
+
+    total_time = dataframe_days[list(time_columns.values())].sum()
+    total_time.index = list(time_columns)
+    kept_apps = set(total_time.nlargest(max_apps).index) | set(keep)
+    other_apps = [app for app in time_columns if app not in kept_apps]
+
+    dataframe_days = dataframe_days.copy()
+    dataframe_days['Time in Other apps'] = dataframe_days[[time_columns[app] for app in other_apps]].sum(axis=1)
+    dataframe_days['Count of Other apps'] = dataframe_days[[count_columns[app] for app in other_apps if app in count_columns]].sum(axis=1)
+    return dataframe_days.drop(columns=[time_columns[app] for app in other_apps] + [count_columns[app] for app in other_apps if app in count_columns])
+
+
+def concat_dataframe_days(day_frames):
+    """
+    Concatenate dataframe_days built from different parts of the AWT data.
+
+    The parts can have different apps; apps that are absent from a part had
+    no use on its days and get zero time and count.
+    """
+    dataframe_days = pd.concat(day_frames, ignore_index=True)
+    for prefix in ('Time in ', 'Count of '):
+        app_columns = [column for column in dataframe_days.columns if column.startswith(prefix)]
+        dataframe_days[app_columns] = dataframe_days[app_columns].fillna(0)
+        if prefix == 'Count of ':
+            dataframe_days[app_columns] = dataframe_days[app_columns].astype(int)
+
+    # Restore the column order of build_dataframe_days, with the app columns of all parts
+    first_columns = list(day_frames[0].columns)
+    is_app_column = [column.startswith(('Time in ', 'Count of ')) for column in first_columns]
+    app_position = is_app_column.index(True)
+    columns = [column for column, is_app in zip(first_columns, is_app_column) if not is_app]
+    columns[app_position:app_position] = (
+        sorted(column for column in dataframe_days.columns if column.startswith('Time in '))
+        + sorted(column for column in dataframe_days.columns if column.startswith('Count of '))
+    )
+    return dataframe_days[columns]
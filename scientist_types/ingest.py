@@ -0,0 +1,290 @@
+"""
+Reading and cleaning of the uploaded Tockler (AWT) and survey CSV files.
+"""
+
+import codecs
+import csv
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+
+from scientist_types.slots import EXCLUDED_TITLES
+from scientist_types.timeofday import wall_time
+from scientist_types.titles import DEFAULT_TITLE_RULES
+
+# Number of bytes at the start of a file used to detect its encoding and delimiter
+SNIFF_BYTES = 64 * 1024
+
+# Delimiters a CSV export may use
+DELIMITERS = ',;\t|'
+
+# A UTC offset at the end of a timestamp, e.g. '+02:00', '+0200' or 'Z'
+TIMEZONE_OFFSET = r'\s*(?:Z|[+-]\d{2}:?\d{2})$'
+
+# Byte order marks and the encodings they stand for
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _decode_as_latin1(error):
+    # Codec error handler: bytes that are not valid UTF-8 are decoded as Latin-1
+    return error.object[error.start:error.end].decode('latin1'), error.end
+
+
+# Decoding error handler for files that look like UTF-8 in their first bytes,
+# but can still turn out to be Latin-1 further on
+LATIN1_FALLBACK = 'scientist_types.latin1_fallback'
+codecs.register_error(LATIN1_FALLBACK, _decode_as_latin1)
+
+
+def parse_timestamps(column, datetime_format=None):
+    """
+    Parse a column of timestamps to datetime64 at second precision.
+
+    Without an explicit datetime_format, pandas infers the format from the
+    first value and applies it to the whole column. Unparseable values become
+    NaT and timezone offsets are dropped, keeping the local wall time.
+    """
+    try:
+        timestamps = pd.to_datetime(column, format=datetime_format, errors='coerce')
+    except ValueError:
+        # Offsets that change within an export (e.g. at a DST switch) do not fit in one
+        # timezone-aware column, so they are removed from the text, which keeps the wall time
+        column = column.astype(str).str.replace(TIMEZONE_OFFSET, '', regex=True)
+        datetime_format = datetime_format.replace('%z', '') if datetime_format else None
+        timestamps = pd.to_datetime(column, format=datetime_format, errors='coerce')
+    return wall_time(timestamps).dt.floor('s')
+
+
+def sniff_encoding(prefix):
+    """
+    Detect the encoding of a file from the first bytes: a byte order mark,
+    else UTF-8 if the bytes are valid UTF-8, else Latin-1.
+    """
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    try:
+        # The prefix may end in the middle of a character; final=False allows that
+        codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin1'
+
+
+def sniff_delimiter(text):
+    """
+    Detect the delimiter of the CSV text at the start of a file, falling back
+    to the candidate that occurs most in the header.
+    """
+    # Only complete lines are sniffed
+    lines = text[:text.rfind('\n')] if '\n' in text else text
+    try:
+        return csv.Sniffer().sniff(lines, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        header = lines.split('\n', 1)[0]
+        return max(DELIMITERS, key=header.count)
+
+
+def sniff_csv(prefix):
+    """
+    The encoding and delimiter of a CSV file, from its first bytes.
+    """
+    encoding = sniff_encoding(prefix)
+    text = prefix.decode(encoding, errors='ignore')
+    return encoding, sniff_delimiter(text)
+
+
+def read_csv_bytes(file_bytes, delimiter=None, **kwargs):
+    """
+    Read CSV bytes into a DataFrame, detecting the encoding and, unless
+    given, the delimiter from the first SNIFF_BYTES bytes.
+
+    The bytes are parsed directly; pandas decodes them while parsing, so no
+    decoded copy of the whole file is made. A file that looks like UTF-8 at
+    the start but is not is read again as Latin-1.
+    """
+    encoding, sniffed_delimiter = sniff_csv(file_bytes[:SNIFF_BYTES])
+    delimiter = delimiter or sniffed_delimiter
+    try:
+        return pd.read_csv(BytesIO(file_bytes), delimiter=delimiter, encoding=encoding, **kwargs)
+    except UnicodeDecodeError:
+        return pd.read_csv(BytesIO(file_bytes), delimiter=delimiter, encoding='latin1', **kwargs)
+
+
+def sniff_file(file):
+    """
+    The encoding and delimiter of a CSV file given as a path or a binary
+    file object, which is rewound afterwards.
+    """
+    if hasattr(file, 'read'):
+        position = file.tell()
+        prefix = file.read(SNIFF_BYTES)
+        file.seek(position)
+    else:
+        with open(file, 'rb') as opened:
+            prefix = opened.read(SNIFF_BYTES)
+    return sniff_csv(prefix)
+
+
+def load_awt_data(file_bytes, delimiter=None, datetime_format=None, title_rules=None):
+    """
+    Read a Tockler CSV export into a cleaned AWT dataframe with datetime64
+    Begin and End columns. The delimiter is detected unless given.
+    """
+    dataframe_awt = read_csv_bytes(file_bytes, delimiter=delimiter)
+
+    return clean_awt_data(dataframe_awt, datetime_format=datetime_format, title_rules=title_rules)
+
+
+def _csv_members(archive):
+    # The CSV files in a ZIP archive, skipping folders and the metadata macOS adds to archives
+    return [
+        member for member in archive.infolist()
+        if not member.is_dir() and not member.filename.startswith('__MACOSX/') and member.filename.lower().endswith('.csv')
+    ]
+
+
+def expand_awt_files(files):
+    """
+    The CSV files among the uploaded files, with the members of ZIP archives
+    taking the place of the archive.
+
+    files is a list of (name, bytes) pairs; so is the result, in name order.
+    """
+    expanded = []
+    for name, file_bytes in files:
+        if zipfile.is_zipfile(BytesIO(file_bytes)):
+            with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+                for member in _csv_members(archive):
+                    expanded.append((f'{name}/{member.filename}', archive.read(member)))
+        else:
+            expanded.append((name, file_bytes))
+    return sorted(expanded, key=lambda file: file[0])
+
+
+def open_awt_files(files):
+    """
+    Like expand_awt_files, but with binary file objects instead of bytes.
+    ZIP members are decompressed while they are read, so a large archive is
+    never decompressed into memory at once (see streaming.stream_dataframe_days).
+    """
+    opened = []
+    for name, file_bytes in files:
+        if zipfile.is_zipfile(BytesIO(file_bytes)):
+            # The members keep the archive open until they are closed
+            archive = zipfile.ZipFile(BytesIO(file_bytes))
+            for member in _csv_members(archive):
+                opened.append((f'{name}/{member.filename}', archive.open(member)))
+        else:
+            opened.append((name, BytesIO(file_bytes)))
+    return sorted(opened, key=lambda file: file[0])
+
+
+def load_awt_files(files, delimiter=None, datetime_format=None, workers=None, title_rules=None):
+    """
+    Read one or more Tockler CSV exports, or ZIP archives of them, into one
+    cleaned AWT dataframe sorted by Begin.
+
+    files is the bytes of a single export or a list of (name, bytes) pairs.
+    The files are parsed in a thread pool; pandas' CSV parser releases the
+    GIL, so they are parsed concurrently. Events that appear in more than
+    one export are kept once. Raises ValueError when no events are left
+    after cleaning (e.g. when all titles are NO_TITLE).
+    """
+    if isinstance(files, bytes):
+        files = [('', files)]
+    files = expand_awt_files(files)
+    if not files:
+        raise ValueError('The upload does not contain any CSV files.')
+    if len(files) == 1:
+        frames = [load_awt_data(files[0][1], delimiter=delimiter, datetime_format=datetime_format, title_rules=title_rules)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers or min(len(files), os.cpu_count() or 1)) as executor:
+            frames = list(executor.map(
+                lambda file: load_awt_data(file[1], delimiter=delimiter, datetime_format=datetime_format, title_rules=title_rules),
+                files
+            ))
+
+    # A single export goes through the same sort, so the work slots do not depend on how the data was split
+    dataframe_awt = combine_awt_data(frames)
+    if dataframe_awt.empty:
+        raise ValueError('The AWT file does not contain any events.')
+    return dataframe_awt
+
+
+def combine_awt_data(frames):
+    """
+    Concatenate cleaned AWT dataframes of possibly overlapping periods into
+    one, sorted by Begin.
+
+    An event that is in several exports is kept once. When an export ended
+    while a window was still active, that window has an earlier End there;
+    the copy with the latest End is kept.
+    """
+    dataframe_awt = pd.concat(frames, ignore_index=True)
+
+    # Sort by Begin and End, so the last copy of an event has the latest End
+    dataframe_awt = dataframe_awt.sort_values(['Begin', 'End'], kind='stable')
+    dataframe_awt = dataframe_awt.drop_duplicates(subset=['Begin', 'App', 'Title'], keep='last')
+
+    # Concatenating categoricals with different categories gives strings again
+    dataframe_awt['App'] = dataframe_awt['App'].astype(str).astype('category')
+    dataframe_awt['Title'] = dataframe_awt['Title'].astype(str).astype('category')
+    dataframe_awt['Raw Title'] = dataframe_awt['Raw Title'].astype(str).astype('category')
+
+    return dataframe_awt.reset_index(drop=True)
+
+
+def clean_awt_data(dataframe_awt, datetime_format=None, title_rules=None):
+    """
+    Clean a raw Tockler dataframe (or a chunk of one): normalise the column
+    names, parse Begin/End, drop empty and non-work rows, and normalize and
+    classify the titles with title_rules (see titles.TitleRules; by default
+    the built-in rules).
+    """
+    # Check if the first column name is not 'App'
+    if dataframe_awt.columns[0] != 'App':
+        # Rename the first column to 'App'
+        dataframe_awt.rename(columns={dataframe_awt.columns[0]: 'App'}, inplace=True)
+
+    # Convert 'Begin' and 'End' to datetime once; the columns stay datetime64 from here on
+    for column in ('Begin', 'End'):
+        if column in dataframe_awt.columns:
+            dataframe_awt[column] = parse_timestamps(dataframe_awt[column], datetime_format=datetime_format)
+
+    # Drop the 'Type' column if it exists
+    if 'Type' in dataframe_awt.columns:
+        dataframe_awt = dataframe_awt.drop(columns=['Type'])
+
+    # Remove rows where 'Begin' is empty
+    dataframe_awt = dataframe_awt.dropna(subset=['Begin'])
+
+    # Remove rows where 'Title' is 'NO_TITLE'
+    dataframe_awt = dataframe_awt[~dataframe_awt['Title'].isin(EXCLUDED_TITLES)].copy()
+
+    # Store 'App' and 'Title' as categoricals of strings; both repeat heavily
+    dataframe_awt['App'] = dataframe_awt['App'].astype(str).astype('category')
+    dataframe_awt['Title'] = dataframe_awt['Title'].astype(str).astype('category')
+
+    # Titles that only differ in details such as '(autosaved)' become one title, with a Category
+    return (title_rules or DEFAULT_TITLE_RULES).apply(dataframe_awt)
+
+
+def load_survey_data(file_bytes):
+    """
+    Read the survey results CSV, sniffing its encoding and delimiter.
+    """
+    # Read the uploaded CSV file into a dataframe
+    dataframe_survey = read_csv_bytes(file_bytes)
+
+    # Convert survey dates to datetime64 to match the AWT days
+    dataframe_survey['Date'] = pd.to_datetime(dataframe_survey['Date'], format='%d-%m-%Y')
+
+    return dataframe_survey
@@ -0,0 +1,65 @@
+"""
+Interval algebra on the timeline of AWT activity.
+
+Events or work slots can overlap, e.g. when Tockler logs windows on several
+monitors, and need not be in order. normalize_intervals turns them into a
+sorted timeline of non-overlapping blocks of activity in one sort and a
+single sweep over NumPy arrays; breaks, idle time and focus blocks are the
+gaps and blocks of that timeline.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_intervals(begin, end, tolerance=0):
+    """
+    Merge intervals into sorted, non-overlapping blocks covering the same time.
+
+    Intervals that overlap, touch or are at most tolerance seconds apart end
+    up in the same block. Intervals with a missing Begin or End are ignored,
+    and an End before its Begin counts as a zero-length interval.
+
+    Returns the Begin and End of every block and the number of intervals in it.
+    """
+    begin = np.asarray(begin, dtype='datetime64[ns]')
+    end = np.asarray(end, dtype='datetime64[ns]')
+    valid = ~np.isnat(begin) & ~np.isnat(end)
+    begin, end = begin[valid], end[valid]
+    if len(begin) == 0:
+        return begin, end, np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(begin, kind='stable')
+    begin = begin[order]
+    end = np.maximum(end[order], begin)
+
+    # Sweep: the furthest End so far is the End of the current block, and a
+    # new block starts wherever an interval begins after it (plus tolerance)
+    reach = np.maximum.accumulate(end)
+    max_gap = np.timedelta64(int(tolerance * 1e9), 'ns')
+    new_block = np.empty(len(begin), dtype=bool)
+    new_block[0] = True
+    new_block[1:] = begin[1:] - reach[:-1] > max_gap
+
+    first_positions = np.flatnonzero(new_block)
+    last_positions = np.append(first_positions[1:] - 1, len(begin) - 1)
+    return begin[first_positions], reach[last_positions], last_positions - first_positions + 1
+
+
+def build_timeline(begin, end, tolerance=0):
+    """
+    The normalized timeline of the intervals as a DataFrame with one row per
+    block: Begin, End, Intervals, Date (of its Begin), Duration (in seconds)
+    and Break Duration, the gap in seconds since the previous block of the
+    same day (missing for the first block of a day).
+    """
+    block_begin, block_end, intervals = normalize_intervals(begin, end, tolerance=tolerance)
+    timeline = pd.DataFrame({'Begin': block_begin, 'End': block_end, 'Intervals': intervals})
+    timeline['Date'] = timeline['Begin'].dt.normalize()
+    timeline['Duration'] = (timeline['End'] - timeline['Begin']).dt.total_seconds()
+
+    # The blocks are sorted, so the previous block of the same day is the previous row
+    gap = (timeline['Begin'] - timeline['End'].shift(1)).dt.total_seconds()
+    same_day = timeline['Date'].eq(timeline['Date'].shift(1))
+    timeline['Break Duration'] = gap.where(same_day)
+    return timeline
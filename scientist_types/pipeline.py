@@ -0,0 +1,76 @@
+"""
+A small dependency-tracked pipeline for the steps that run on every rerun.
+
+Every stage declares the names of its inputs, which are either other stages
+or input values. A stage's result is kept together with the keys of its
+inputs and reused as long as those keys are unchanged, so changing one input
+only recomputes the stages that depend on it:
+
+    pipeline = Pipeline(cache)
+    pipeline.input('dataframe_days', dataframe_days, key=file_hash)
+    pipeline.input('max_apps', max_apps)
+
+    @pipeline.stage('limited_days', inputs=['dataframe_days', 'max_apps'])
+    def limit(dataframe_days, max_apps):
+        ...
+
+    limited_days = pipeline.get('limited_days')
+"""
+
+
+class Pipeline:
+    """
+    Stages and inputs of a pipeline, with the last result of every stage
+    kept in cache (a dict, e.g. Streamlit's session state, to keep results
+    between reruns, or anything with get and item assignment, such as a
+    server.SessionCache).
+    """
+
+    def __init__(self, cache=None):
+        self.cache = {} if cache is None else cache
+        self._inputs = {}
+        self._stages = {}
+
+    def input(self, name, value, key=None):
+        """
+        Set an input value. Its key identifies the value; without one, the
+        value itself is the key and must be hashable.
+        """
+        self._inputs[name] = (value, value if key is None else key)
+
+    def stage(self, name, inputs=()):
+        """
+        Register the decorated function as a stage that is called with the
+        values of its inputs, in order.
+        """
+        def register(function):
+            self._stages[name] = (function, tuple(inputs))
+            return function
+        return register
+
+    def key(self, name):
+        """
+        The key of an input, or of a stage: its name with the keys of its inputs.
+        """
+        if name in self._inputs:
+            return self._inputs[name][1]
+        _, inputs = self._stages[name]
+        return (name,) + tuple(self.key(input_name) for input_name in inputs)
+
+    def get(self, name):
+        """
+        The value of an input or the result of a stage, computing the stage
+        (and the stages it depends on) only if one of its inputs changed.
+        """
+        if name in self._inputs:
+            return self._inputs[name][0]
+
+        function, inputs = self._stages[name]
+        key = self.key(name)
+        cached = self.cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        result = function(*(self.get(input_name) for input_name in inputs))
+        self.cache[name] = (key, result)
+        return result
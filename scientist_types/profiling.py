@@ -0,0 +1,115 @@
+"""
+Timing and memory measurements of the pipeline stages.
+
+A Profiler records, for every stage it wraps, the wall time, the peak memory
+allocated during the stage and the number of rows going in and out:
+
+    profiler = Profiler()
+    with profiler.stage('Merge work slots', rows_in=len(dataframe_awt)) as stage:
+        dataframe_merged_awt = build_work_slots(dataframe_awt)
+        stage['rows_out'] = len(dataframe_merged_awt)
+
+A disabled profiler records nothing and adds no overhead.
+
+tracemalloc traces the whole process, so memory is only measured for a stage
+that runs on its own. When stages of several profilers (e.g. of several
+Streamlit sessions) overlap, their peak memory is left empty.
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Number of functions listed in the cProfile report
+PROFILE_REPORT_LINES = 40
+
+# Profiled stages that are running in any thread, and whether another stage
+# started while the one that traces memory was running
+_stages_lock = threading.Lock()
+_running_stages = 0
+_overlapped = False
+
+
+class Profiler:
+    """
+    Collects the measurements of the stages of one run.
+    """
+
+    def __init__(self, enabled=True, trace_memory=True):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        if not self.enabled:
+            yield record
+            return
+
+        # Memory is only traced while a stage runs; tracing slows allocations down.
+        # Only the stage that started the tracing stops it
+        global _running_stages, _overlapped
+        with _stages_lock:
+            _running_stages += 1
+            tracing = self.trace_memory and _running_stages == 1 and not tracemalloc.is_tracing()
+            if tracing:
+                _overlapped = False
+                tracemalloc.start()
+            else:
+                _overlapped = True
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            with _stages_lock:
+                _running_stages -= 1
+                if tracing:
+                    # The peak includes the allocations of any stage that ran at the same time
+                    if not _overlapped:
+                        record['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2**20
+                    tracemalloc.stop()
+            self.records.append(record)
+
+    def to_frame(self):
+        """
+        The measurements as a DataFrame, one row per stage in the order they ran.
+        """
+        columns = ['stage', 'seconds', 'peak_memory_mb', 'rows_in', 'rows_out']
+        frame = pd.DataFrame(self.records).reindex(columns=columns)
+        return frame.rename(columns={
+            'stage': 'Stage',
+            'seconds': 'Seconds',
+            'peak_memory_mb': 'Peak Memory (MB)',
+            'rows_in': 'Rows In',
+            'rows_out': 'Rows Out',
+        })
+
+    def to_json(self):
+        return json.dumps({
+            'total_seconds': sum(record['seconds'] for record in self.records),
+            'stages': self.records,
+        }, indent=2, default=str)
+
+
+def profile_call(function, *args, **kwargs):
+    """
+    Run function under cProfile.
+
+    Returns the result and a text report of the functions with the highest
+    cumulative time.
+    """
+    profile = cProfile.Profile()
+    result = profile.runcall(function, *args, **kwargs)
+
+    report = io.StringIO()
+    pstats.Stats(profile, stream=report).sort_stats('cumulative').print_stats(PROFILE_REPORT_LINES)
+    return result, report.getvalue()
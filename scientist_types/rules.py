@@ -0,0 +1,140 @@
+"""
+The rules that relate each scientist type to correlations between the
+AWT features and the productivity score.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Correlations beyond this value count as positive or negative
+CORRELATION_THRESHOLD = 0.1
+
+# How a correlation with productivity is expected to look for a rule to
+# match, as (direction, threshold): the correlation has to be above the
+# threshold for direction 1 and below it for direction -1
+EXPECTED_SIGNS = {
+    'positive': (1, CORRELATION_THRESHOLD),
+    'negative': (-1, -CORRELATION_THRESHOLD),
+    'not positive': (-1, CORRELATION_THRESHOLD),
+    'not negative': (1, -CORRELATION_THRESHOLD),
+}
+
+# Apps that the scientist types and the correlation matrix refer to by name
+REFERENCED_APPS = [
+    'Microsoft Teams', 'Microsoft Outlook', 'Microsoft Word', 'Microsoft Excel', 'Google Chrome', 'Adobe Acrobat'
+]
+
+Rule = namedtuple('Rule', ['scientist_type', 'variable', 'expected_sign', 'message'])
+
+SCIENTIST_TYPES = [
+    'Social scientist',
+    'Lone scientist',
+    'Focused scientist',
+    'Balanced scientist',
+    'Leading scientist',
+    'Goal-oriented scientist',
+]
+
+RULES = [
+    Rule('Social scientist', 'Time in Microsoft Teams', 'positive', 'More time spent in Teams (helping coworkers, collaborating) feels more productive'),
+    Rule('Social scientist', 'Start Time (Decimal)', 'negative', 'Starting earlier feels more productive'),
+    Rule('Social scientist', 'End Time (Decimal)', 'positive', 'Ending later feels more productive'),
+    Rule('Social scientist', 'Duration of Longest Title', 'positive', 'Spending a long time on one task feels more productive'),
+
+    Rule('Lone scientist', 'Count of Microsoft Teams', 'negative', 'Less times opening Teams feels more productive'),
+    Rule('Lone scientist', 'Count of Microsoft Outlook', 'negative', 'Less times opening Outlook feels more productive'),
+    Rule('Lone scientist', 'Average Work Slot Duration', 'positive', 'Longer work slots feel more productive'),
+    Rule('Lone scientist', 'Total Time Spent (hours)', 'positive', 'More time spent on computer feels more productive'),
+    Rule('Lone scientist', 'Average Break Duration', 'negative', 'Longer breaks feel less productive'),
+    Rule('Lone scientist', 'Total Breaks', 'negative', 'More breaks feel less productive'),
+
+    Rule('Focused scientist', 'Share of Work Slots with Most Frequent Title', 'negative', 'More work slots spent on the same task feels unproductive'),
+    Rule('Focused scientist', 'Title count per hour on computer', 'negative', 'Less switching between tasks feels more productive'),
+    Rule('Focused scientist', 'Average Work Slot Duration', 'positive', 'Longer work slots feel more productive'),
+    Rule('Focused scientist', 'Duration of Longest Title', 'negative', 'Long work on a single task feels unproductive'),
+    Rule('Focused scientist', 'Total Breaks', 'negative', 'More breaks feel less productive'),
+
+    Rule('Balanced scientist', 'Start Time (Decimal)', 'not negative', 'Starting earlier does not increase the feeling of productivity'),
+    Rule('Balanced scientist', 'Total Breaks', 'not negative', 'More breaks do not decrease the feeling of productivity'),
+    Rule('Balanced scientist', 'End Time (Decimal)', 'not positive', 'Ending later does not increase the feeling of productivity'),
+    Rule('Balanced scientist', 'Time in Microsoft Outlook', 'negative', 'Less time spent in Outlook feels more productive'),
+    Rule('Balanced scientist', 'Time in Microsoft Teams', 'negative', 'Less time spent in Teams feels more productive'),
+
+    Rule('Leading scientist', 'Time in Microsoft Teams', 'not negative', 'More time spent in Teams does not decrease the feeling of productivity'),
+    Rule('Leading scientist', 'Time in Microsoft Outlook', 'not negative', 'More time spent in Outlook does not decrease the feeling of productivity'),
+    Rule('Leading scientist', 'Median Time of Day', 'positive', 'Working later in the day mostly, feels more productive'),
+    Rule('Leading scientist', 'Share of Time in Afternoon', 'positive', 'Spending more of the day\'s work in the afternoon feels more productive'),
+
+    Rule('Goal-oriented scientist', 'Title count per hour on computer', 'negative', 'Less switching between tasks feels more productive'),
+    Rule('Goal-oriented scientist', 'Time in Microsoft Teams', 'not negative', 'More time spent in Teams (meetings) does not decrease the feeling of productivity'),
+    Rule('Goal-oriented scientist', 'Time in Microsoft Outlook', 'not negative', 'More time spent in Outlook (emails) does not decrease the feeling of productivity'),
+    Rule('Goal-oriented scientist', 'Average Work Slot Duration', 'positive', 'Longer work slots feel more productive'),
+]
+
+
+def evaluate_rules(productivity_results, rules=RULES):
+    """
+    Evaluate all rules against the correlations with productivity at once.
+
+    Returns one row per rule whose variable is in the results, with its
+    Correlation and whether it Matched, ordered by scientist type and then
+    by variable.
+    """
+    rule_table = pd.DataFrame(rules, columns=Rule._fields)
+    correlations = productivity_results[['Variable', 'Correlation with Productivity']].rename(
+        columns={'Variable': 'variable', 'Correlation with Productivity': 'Correlation'}
+    )
+    evaluated = rule_table.merge(correlations, on='variable', how='inner')
+
+    direction = evaluated['expected_sign'].map(lambda sign: EXPECTED_SIGNS[sign][0])
+    threshold = evaluated['expected_sign'].map(lambda sign: EXPECTED_SIGNS[sign][1])
+    # NaN correlations never match
+    evaluated['Matched'] = (direction * (evaluated['Correlation'] - threshold) > 0).to_numpy()
+
+    type_order = evaluated['scientist_type'].map({name: i for i, name in enumerate(SCIENTIST_TYPES)})
+    return evaluated.iloc[np.lexsort((evaluated['variable'], type_order))].reset_index(drop=True)
+
+
+def score_scientist_types(productivity_results, rules=RULES):
+    """
+    Score every scientist type by the share of its rules that match the
+    correlations with productivity. Rules whose variable is missing from
+    the results are not counted.
+    """
+    evaluated = evaluate_rules(productivity_results, rules=rules)
+    scores = evaluated.groupby('scientist_type')['Matched'].agg(['sum', 'size']).reindex(SCIENTIST_TYPES, fill_value=0)
+    return pd.DataFrame({
+        'Scientist Type': SCIENTIST_TYPES,
+        'Matched Rules': scores['sum'].to_numpy(),
+        'Checked Rules': scores['size'].to_numpy(),
+        'Score': (scores['sum'] / scores['size'].replace(0, np.nan)).to_numpy(),
+    })
+
+
+def score_scientist_types_over_time(correlations, rules=RULES):
+    """
+    Score every scientist type at every row of correlations, a DataFrame of
+    correlations with productivity with a column per variable (e.g. per day,
+    see stats.rolling_correlations), like score_scientist_types.
+
+    Returns a DataFrame with the same index and a column per scientist type.
+    Scores are missing where none of the correlations of a type are known.
+    """
+    rule_table = pd.DataFrame([rule for rule in rules if rule.variable in correlations.columns], columns=Rule._fields)
+    values = correlations.reindex(columns=rule_table['variable']).to_numpy(dtype=float)
+
+    direction = rule_table['expected_sign'].map(lambda sign: EXPECTED_SIGNS[sign][0]).to_numpy()
+    threshold = rule_table['expected_sign'].map(lambda sign: EXPECTED_SIGNS[sign][1]).to_numpy()
+    # NaN correlations never match
+    matched = direction * (values - threshold) > 0
+    known = ~np.isnan(values)
+
+    scores = {}
+    for scientist_type in SCIENTIST_TYPES:
+        type_rules = (rule_table['scientist_type'] == scientist_type).to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            score = matched[:, type_rules].sum(axis=1) / type_rules.sum()
+        scores[scientist_type] = np.where(known[:, type_rules].any(axis=1), score, np.nan)
+    return pd.DataFrame(scores, index=correlations.index)
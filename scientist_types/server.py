@@ -0,0 +1,265 @@
+"""
+Shared processing for a hosted instance with several users at once.
+
+In server mode the AWT pipeline of every session runs in one bounded process
+pool instead of the Streamlit script thread. Jobs wait in a queue when all
+workers are busy, and the results are kept in a store that limits the memory
+of each session and drops the data of sessions that have been idle for a
+while. The memory a job may use is capped in its worker process, so one large
+upload cannot take the memory of the whole server. Server mode is switched on
+with environment variables:
+
+    AWT_SERVER_MODE=1              run the pipeline in the shared pool
+    AWT_SERVER_WORKERS=2           number of worker processes
+    AWT_SERVER_MAX_QUEUED=16       jobs that may wait or run at once
+    AWT_SESSION_MEMORY_MB=512      memory of the results kept per session
+    AWT_WORKER_MEMORY_MB=2048      memory a job may use in its worker process (0: no limit)
+    AWT_SESSION_IDLE_SECONDS=1800  idle time after which a session's data is dropped
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the worker memory is not capped there
+    resource = None
+
+from scientist_types.features import build_dataframe_days, prepare_awt_events
+from scientist_types.ingest import load_awt_files, open_awt_files
+from scientist_types.slots import build_work_slots
+from scientist_types.store import DEFAULT_STORE_DIR, read_table, update_store
+from scientist_types.streaming import stream_dataframe_days
+
+SERVER_MODE = os.environ.get('AWT_SERVER_MODE', '').lower() in ('1', 'true', 'yes')
+SERVER_WORKERS = int(os.environ.get('AWT_SERVER_WORKERS', 2))
+MAX_QUEUED_JOBS = int(os.environ.get('AWT_SERVER_MAX_QUEUED', 16))
+SESSION_MEMORY_LIMIT = int(os.environ.get('AWT_SESSION_MEMORY_MB', 512)) * 2**20
+SESSION_IDLE_TIMEOUT = int(os.environ.get('AWT_SESSION_IDLE_SECONDS', 1800))
+WORKER_MEMORY_LIMIT = int(os.environ.get('AWT_WORKER_MEMORY_MB', 2048)) * 2**20
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class MemoryLimitError(RuntimeError):
+    pass
+
+
+def process_awt_days(files, delimiter=None, tolerance=0, low_memory=False, participant=None, store_dir=DEFAULT_STORE_DIR,
+                     title_rules=None):
+    """
+    Turn uploaded AWT files, a list of (name, bytes) pairs, into day
+    features, the way the app does.
+
+    Runs in a worker process. Only the day features are returned, so the
+    events and work slots never reach the session.
+    """
+    if low_memory:
+        exports = [file for _, file in open_awt_files(files)]
+        return stream_dataframe_days(exports, delimiter=delimiter, tolerance=tolerance, title_rules=title_rules)
+
+    dataframe_awt = load_awt_files(files, delimiter=delimiter, title_rules=title_rules)
+    if participant:
+        update_store(store_dir, participant, dataframe_awt, tolerance=tolerance, title_rules=title_rules)
+        return read_table(store_dir, participant, 'days')
+
+    dataframe_merged_awt = build_work_slots(dataframe_awt, tolerance=tolerance)
+    return build_dataframe_days(prepare_awt_events(dataframe_awt), dataframe_merged_awt)
+
+
+def _limit_memory(memory_limit):
+    # Pool initializer: cap the address space of the worker process at what it
+    # uses after starting plus memory_limit, so a job that needs more fails with
+    # a MemoryError in its worker instead of exhausting the server's memory
+    if resource is None or not memory_limit:
+        return
+    try:
+        with open('/proc/self/statm') as file:
+            address_space = int(file.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_AS)
+    soft_limit = address_space + memory_limit
+    if hard_limit != resource.RLIM_INFINITY:
+        soft_limit = min(soft_limit, hard_limit)
+    resource.setrlimit(resource.RLIMIT_AS, (soft_limit, hard_limit))
+
+
+def _run_job(memory_limit, function, args, kwargs):
+    # Runs in a worker process
+    try:
+        return function(*args, **kwargs)
+    except MemoryError:
+        raise MemoryLimitError(
+            f'Processing needs more than the {memory_limit / 2**20:.0f} MB of memory available per job. '
+            'Try the low-memory mode or a shorter export.'
+        ) from None
+
+
+def data_size(value):
+    """
+    Memory used by a DataFrame, or by the DataFrames in a tuple, list or dict,
+    in bytes.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, dict):
+        return sum(data_size(item) for item in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(data_size(item) for item in value)
+    return 0
+
+
+class JobQueue:
+    """
+    A bounded queue of jobs that run in a shared process pool.
+
+    Jobs are identified by a key; submitting a key that is still queued or
+    running returns the existing job, so reruns of a waiting session do not
+    queue the same work twice. A job that needs more than memory_limit bytes
+    (None: no limit) fails with a MemoryLimitError.
+
+    When a worker process dies (e.g. killed by the system for its memory
+    use), the jobs in the pool at that moment fail with BrokenProcessPool and
+    the next job starts a new pool.
+    """
+
+    def __init__(self, workers=SERVER_WORKERS, max_queued=MAX_QUEUED_JOBS, memory_limit=WORKER_MEMORY_LIMIT):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.memory_limit = memory_limit
+        self._executor = self._start_pool()
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, key, function, *args, **kwargs):
+        with self._lock:
+            # Drop finished jobs of other sessions; their sessions already hold the results
+            self._jobs = {job_key: future for job_key, future in self._jobs.items() if not future.done() or job_key == key}
+            if key in self._jobs:
+                return self._jobs[key]
+            if len(self._jobs) >= self.max_queued:
+                raise QueueFullError('The server is busy processing other uploads. Please try again in a few minutes.')
+
+            try:
+                future = self._executor.submit(_run_job, self.memory_limit, function, args, kwargs)
+            except BrokenProcessPool:
+                # The jobs of the broken pool have already failed; the other sessions go on in a new one
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._start_pool()
+                future = self._executor.submit(_run_job, self.memory_limit, function, args, kwargs)
+            self._jobs[key] = future
+            return future
+
+    def _start_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_limit_memory, initargs=(self.memory_limit,))
+
+    def position(self, key):
+        """
+        Number of jobs that have to finish before the job with this key can
+        start; 0 once it is running or done.
+        """
+        # The pool hands jobs to the workers in submission order
+        with self._lock:
+            unfinished = [job_key for job_key, future in self._jobs.items() if not future.done()]
+        if key not in unfinished:
+            return 0
+        return max(0, unfinished.index(key) - self.workers + 1)
+
+    def forget(self, key):
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class SessionStore:
+    """
+    Results of each session, within a memory limit per session.
+
+    When a new result does not fit, the session's least recently used results
+    are dropped first. Sessions that have not been used for idle_timeout
+    seconds are dropped by evict_idle.
+    """
+
+    def __init__(self, memory_limit=SESSION_MEMORY_LIMIT, idle_timeout=SESSION_IDLE_TIMEOUT):
+        self.memory_limit = memory_limit
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def get(self, session_id, key):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or key not in session['results']:
+                return None
+            session['last_used'] = time.monotonic()
+            # Move the result to the end, so it is the last one to be dropped
+            result = session['results'].pop(key)
+            session['results'][key] = result
+            return result[0]
+
+    def put(self, session_id, key, value):
+        size = data_size(value)
+        if size > self.memory_limit:
+            raise MemoryLimitError(
+                f'The processed data ({size / 2**20:.0f} MB) exceeds the limit of '
+                f'{self.memory_limit / 2**20:.0f} MB per user. Try the low-memory mode or a shorter export.'
+            )
+
+        with self._lock:
+            session = self._sessions.setdefault(session_id, {'results': {}, 'last_used': None})
+            session['last_used'] = time.monotonic()
+            session['results'].pop(key, None)
+            while session['results'] and self._session_size(session) + size > self.memory_limit:
+                del session['results'][next(iter(session['results']))]
+            session['results'][key] = (value, size)
+
+    def memory_usage(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return self._session_size(session) if session else 0
+
+    def evict_idle(self, now=None):
+        """
+        Drop the data of sessions that have been idle too long and return
+        their ids.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [session_id for session_id, session in self._sessions.items() if now - session['last_used'] > self.idle_timeout]
+            for session_id in idle:
+                del self._sessions[session_id]
+        return idle
+
+    @staticmethod
+    def _session_size(session):
+        return sum(size for _, size in session['results'].values())
+
+
+class SessionCache:
+    """
+    The results of a session in a SessionStore, as a dict-like cache for a
+    Pipeline. They count towards the memory limit of the session and are
+    dropped with its other data when it is idle.
+    """
+
+    def __init__(self, store, session_id, prefix='pipeline'):
+        self.store = store
+        self.session_id = session_id
+        self.prefix = prefix
+
+    def get(self, name, default=None):
+        value = self.store.get(self.session_id, (self.prefix, name))
+        return default if value is None else value
+
+    def __setitem__(self, name, value):
+        self.store.put(self.session_id, (self.prefix, name), value)
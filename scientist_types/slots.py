@@ -0,0 +1,149 @@
+"""
+Merging of consecutive AWT window events into continued work slots.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Separator used when concatenating the apps and titles of a merged slot
+SLOT_SEPARATOR = '; '
+
+
+def compute_slot_ids(begin, end, tolerance=0):
+    """
+    Assign a work slot ID to every event.
+
+    An event continues the previous slot when its Begin lies between the
+    previous event's End and End + tolerance (in seconds). Events with a
+    missing Begin or End always start a new slot.
+    """
+    begin = np.asarray(begin, dtype='datetime64[ns]')
+    end = np.asarray(end, dtype='datetime64[ns]')
+    if len(begin) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    # Gap between each event and the End of the event before it
+    gap = begin[1:] - end[:-1]
+    max_gap = np.timedelta64(int(tolerance * 1e9), 'ns')
+    continues = ~np.isnat(gap) & (gap >= np.timedelta64(0, 'ns')) & (gap <= max_gap)
+
+    # A new slot starts wherever an event does not continue the previous one
+    new_slot = np.empty(len(begin), dtype=bool)
+    new_slot[0] = True
+    new_slot[1:] = ~continues
+    return np.cumsum(new_slot) - 1
+
+
+def _codes(column):
+    # Integer codes of a (categorical) column and the values they refer to
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(), column.cat.categories
+    codes, uniques = pd.factorize(column)
+    return codes, uniques
+
+
+def most_occurring_values(column, slot_ids):
+    """
+    Find the most occurring value of a column within every work slot.
+
+    Counts the integer codes of the values per slot in a single groupby.
+    Ties are won by the value that occurs first in the slot.
+    """
+    codes, values = _codes(column)
+    counts = pd.DataFrame({'Slot': slot_ids, 'Code': codes, 'Position': np.arange(len(codes))})
+    counts = counts.groupby(['Slot', 'Code'], sort=False).agg(Count=('Position', 'size'), First=('Position', 'min'))
+
+    # Order each slot's codes by count (descending) and first position, then take the top one
+    counts = counts.reset_index().sort_values(['Slot', 'Count', 'First'], ascending=[True, False, True])
+    top_codes = counts.drop_duplicates('Slot')['Code'].to_numpy()
+    return np.asarray(values, dtype=object)[top_codes]
+
+
+def merge_work_slots(dataframe_awt, tolerance=0, join_titles=False):
+    """
+    Merge consecutive events of an AWT dataframe into work slots.
+
+    Rows are merged in their current order. A merged slot keeps the Begin of
+    its first event and the End of its last event; any other column is taken
+    from its first event. Slot is the ID of the slot (see compute_slot_ids),
+    Events its number of events, and Most_occuring_app/Most_occuring_title
+    its most occurring app and title.
+
+    App and Title only describe the first event of a slot. With join_titles,
+    they hold the '; '-joined values of all its events instead, which is
+    considerably slower for long slots.
+    """
+    if dataframe_awt.empty:
+        # The columns of the work slots, without rows
+        return dataframe_awt.iloc[:0].reset_index(drop=True).assign(
+            Slot=np.zeros(0, dtype=np.int64), Events=np.zeros(0, dtype=np.int64),
+            Most_occuring_app=np.zeros(0, dtype=object), Most_occuring_title=np.zeros(0, dtype=object)
+        )
+
+    slot_ids = compute_slot_ids(
+        dataframe_awt['Begin'].to_numpy(dtype='datetime64[ns]'),
+        dataframe_awt['End'].to_numpy(dtype='datetime64[ns]'),
+        tolerance=tolerance
+    )
+
+    # Positions of the first and last event of every slot
+    first_positions = np.flatnonzero(np.diff(slot_ids, prepend=-1))
+    last_positions = np.append(first_positions[1:] - 1, len(slot_ids) - 1)
+
+    # Every column is taken from the first event, except End
+    dataframe_merged_awt = dataframe_awt.iloc[first_positions].reset_index(drop=True)
+    dataframe_merged_awt['End'] = dataframe_awt['End'].iloc[last_positions].to_numpy()
+    dataframe_merged_awt['Slot'] = np.arange(len(first_positions))
+    dataframe_merged_awt['Events'] = last_positions - first_positions + 1
+
+    if join_titles:
+        for column in ('App', 'Title'):
+            joined = dataframe_awt[column].astype(str).groupby(slot_ids, sort=False).agg(SLOT_SEPARATOR.join)
+            dataframe_merged_awt[column] = joined.to_numpy()
+
+    dataframe_merged_awt['Most_occuring_app'] = most_occurring_values(dataframe_awt['App'], slot_ids)
+    dataframe_merged_awt['Most_occuring_title'] = most_occurring_values(dataframe_awt['Title'], slot_ids)
+    return dataframe_merged_awt
+
+
+# Titles that do not correspond with actual work and are filtered out
+EXCLUDED_TITLES = ['NO_TITLE', 'Windows Default Lock Screen']
+
+
+def build_work_slots(dataframe_awt, tolerance=0):
+    """
+    Merge the cleaned AWT events (see load_awt_data) into work slots with
+    their most occurring app and title.
+    """
+    return merge_work_slots(dataframe_awt, tolerance=tolerance)
+
+
+def find_day_split(dataframe_awt, split_date=None, tolerance=0):
+    """
+    Find the position at which chronologically ordered events can be split
+    without cutting a day or a work slot in two.
+
+    The split is placed at the first event on or after split_date (by default
+    the last day), moved back to the start of any work slot that runs into
+    that day. Returns 0 when no such split exists within the events.
+    """
+    dates = dataframe_awt['Begin'].dt.normalize().to_numpy()
+    slot_ids = compute_slot_ids(
+        dataframe_awt['Begin'].to_numpy(dtype='datetime64[ns]'),
+        dataframe_awt['End'].to_numpy(dtype='datetime64[ns]'),
+        tolerance=tolerance
+    )
+    slot_starts = np.flatnonzero(np.diff(slot_ids, prepend=-1))
+
+    if split_date is None:
+        split_date = dates[-1]
+    split_date = np.datetime64(split_date, 'ns')
+    if not (dates >= split_date).any():
+        return len(dates)
+    while True:
+        position = int(np.argmax(dates >= split_date))
+        slot_start = slot_starts[slot_ids[position]]
+        if dates[slot_start] >= split_date:
+            return position
+        # A work slot continues over midnight; keep its first day open as well
+        split_date = dates[slot_start]
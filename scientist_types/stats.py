@@ -0,0 +1,480 @@
+"""
+Correlations between the survey scores and the AWT features.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import special
+from scipy.stats import rankdata
+
+# Significance level for the 'High' significance label
+SIGNIFICANCE_LEVEL = 0.05
+
+# The survey scores the AWT features are correlated with
+TARGET_COLUMNS = ['Productivity', 'Absorption', 'Vigor', 'Dedication']
+
+# Number of resampled data sets of the bootstrap and permutation tests
+RESAMPLES = 2000
+
+# Resamples per task of the process pool. The tasks are seeded in order, so
+# the results do not depend on the number of workers
+RESAMPLES_PER_TASK = 250
+
+# Memory for the resampled values that are correlated at once, in bytes
+RESAMPLE_BATCH_BYTES = 64 * 2**20
+
+# Windows of rolling correlations need at least this many days with both values
+ROLLING_MIN_DAYS = 7
+
+# Number of variables whose running sums are kept in memory at once
+ROLLING_BLOCK_COLUMNS = 64
+
+# Rounding errors of running and weighted sums are relative to their size, so
+# variances below this share of the sum of squares count as constant
+SUMS_TOLERANCE = 1e-9
+
+
+def merge_survey(dataframe_days, dataframe_survey):
+    """
+    Join the survey results to the AWT days, keeping the days on which the
+    survey was filled in.
+    """
+    # Merge the dataframes on the 'Date' column
+    merged_dataframe = dataframe_days.merge(dataframe_survey, on='Date', how='left')
+
+    # Drop days where no survey was filled in
+    return merged_dataframe.dropna(subset=['Productivity'])
+
+
+def pairwise_correlations(x, y):
+    """
+    Pearson correlations between every column of x and every column of y,
+    each over the rows where both values are present.
+
+    x and y are 2D float arrays with the same number of rows, or stacks of
+    them (e.g. resamples) with the rows and columns as the last two axes.
+    Returns the correlation matrix and the matrix of pairwise sample sizes.
+    """
+    x, x_mask = _center(x)
+    y, y_mask = _center(y)
+    x_t, x_mask_t = np.swapaxes(x, -1, -2), np.swapaxes(x_mask, -1, -2)
+
+    # Sums over the rows where both columns are present, for all pairs at once
+    n = x_mask_t @ y_mask
+    sum_x = x_t @ y_mask
+    sum_y = x_mask_t @ y
+    sum_xx = (x_t ** 2) @ y_mask
+    sum_yy = x_mask_t @ (y ** 2)
+    sum_xy = x_t @ y
+
+    return _correlations_from_sums(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy), n
+
+
+def pairwise_rank_correlations(x, y):
+    """
+    Spearman correlations between every column of x and every column of y,
+    each over the rows where both values are present. Like
+    scipy.stats.spearmanr on those rows, both columns are ranked over these
+    rows only. Takes and returns the same as pairwise_correlations.
+    """
+    x_present, y_present = ~np.isnan(x), ~np.isnan(y)
+    stack_shape = np.broadcast_shapes(x.shape[:-2], y.shape[:-2])
+    r = np.empty(stack_shape + (x.shape[-1], y.shape[-1]))
+    n = np.empty(r.shape)
+
+    # Columns with the same missing rows have the same rows in common with a
+    # column of the other array, so they are ranked together
+    for x_columns in _missing_patterns(x_present):
+        for y_columns in _missing_patterns(y_present):
+            both = (x_present[..., x_columns[0]] & y_present[..., y_columns[0]])[..., None]
+            pairs = (..., x_columns[:, None], y_columns[None, :])
+            r[pairs], n[pairs] = pairwise_correlations(
+                _rank(np.where(both, x[..., x_columns], np.nan)), _rank(np.where(both, y[..., y_columns], np.nan))
+            )
+    return r, n
+
+
+def _missing_patterns(present):
+    """
+    The columns of present (the mask of present values, possibly stacked)
+    grouped by the rows they are present in, as arrays of column positions.
+    """
+    columns = present.shape[-1]
+    present = np.moveaxis(present, -1, 0).reshape(columns, -1)
+    if columns == 0 or present.shape[1] == 0:
+        return [np.arange(columns)] if columns else []
+    _, groups = np.unique(present, axis=0, return_inverse=True)
+    groups = groups.ravel()
+    return [np.flatnonzero(groups == group) for group in range(groups.max() + 1)]
+
+
+def _center(values):
+    """
+    The columns of values minus their means, with missing values set to 0,
+    and the mask of present values as floats.
+    """
+    mask = ~np.isnan(values)
+
+    # Centering by the column means keeps the sums of squares well conditioned;
+    # the correlation does not change by shifting a column
+    with np.errstate(invalid='ignore'):
+        values = np.where(mask, values - np.nanmean(np.where(mask, values, np.nan), axis=-2, keepdims=True), 0.0)
+    return values, mask.astype(float)
+
+
+def _correlations_from_sums(n, sum_x, sum_y, sum_xx, sum_yy, sum_xy, tolerance=0.0):
+    """
+    Pearson correlations from the pairwise sums of pairwise_correlations.
+    Variances up to tolerance count as constant columns.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = sum_xy - sum_x * sum_y / n
+        variance_x = sum_xx - sum_x ** 2 / n
+        variance_y = sum_yy - sum_y ** 2 / n
+        r = covariance / np.sqrt(variance_x * variance_y)
+
+    # Constant columns have no correlation
+    r[(variance_x <= tolerance) | (variance_y <= tolerance)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def correlation_t_test(r, n):
+    """
+    t-statistics and exact two-sided p-values for correlations r over n
+    observations.
+    """
+    degrees_of_freedom = n - 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_stat = r * np.sqrt(degrees_of_freedom / (1 - r ** 2))
+        p_value = 2 * special.stdtr(degrees_of_freedom, -np.abs(t_stat))
+    t_stat[degrees_of_freedom < 1] = np.nan
+    p_value[degrees_of_freedom < 1] = np.nan
+    return t_stat, p_value
+
+
+def adjust_p_values(p_values, correction='fdr_bh'):
+    """
+    Correct the p-values of one family of tests for multiple comparisons.
+
+    correction is 'fdr_bh' (Benjamini-Hochberg), 'bonferroni' or None. NaN
+    p-values are left out of the family.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = np.full_like(p_values, np.nan)
+    tested = ~np.isnan(p_values)
+    m = tested.sum()
+    if correction is None or m == 0:
+        return p_values.copy()
+
+    p = p_values[tested]
+    if correction == 'bonferroni':
+        adjusted[tested] = np.minimum(p * m, 1.0)
+    elif correction == 'fdr_bh':
+        order = np.argsort(p)
+        ranked = p[order] * m / np.arange(1, m + 1)
+        # Enforce monotonicity from the largest p-value down
+        ranked = np.minimum.accumulate(ranked[::-1])[::-1]
+        result = np.empty(m)
+        result[order] = np.minimum(ranked, 1.0)
+        adjusted[tested] = result
+    else:
+        raise ValueError(f'Unknown multiple comparison correction: {correction}')
+    return adjusted
+
+
+def calculate_significance(data, numeric_columns, target_columns, method='pearson', correction='fdr_bh',
+                           significance='t-test', resamples=RESAMPLES, seed=0, workers=None):
+    """
+    Correlate every numeric column with every target column.
+
+    Returns one row per variable with, for each target, the correlation,
+    t-statistic, exact p-value, p-value corrected for multiple comparisons
+    (per target, over all variables) and a 'High'/'Low' significance label.
+    method is 'pearson' or 'spearman'.
+
+    significance is the test behind the label:
+    - 't-test': the corrected p-value of the t-test.
+    - 'bootstrap': adds the bounds of the bootstrap confidence interval
+      (CI Lower and CI Upper); the label is 'High' if it excludes 0.
+    - 'permutation': adds the p-value of a permutation test, which is
+      corrected and labelled instead of the p-value of the t-test.
+    The resampling tests use resamples resampled data sets, seeded by seed
+    and spread over workers processes (see resample_correlations).
+    """
+    numeric_columns = list(numeric_columns)
+    values = data[numeric_columns].astype(float)
+    targets = data[target_columns].astype(float)
+    if method not in ('pearson', 'spearman'):
+        raise ValueError(f'Unknown correlation method: {method}')
+    if significance not in ('t-test', 'bootstrap', 'permutation'):
+        raise ValueError(f'Unknown significance test: {significance}')
+
+    if method == 'spearman':
+        # Rank correlation: Pearson correlation of the ranks of each pair's common days
+        r, n = pairwise_rank_correlations(values.to_numpy(), targets.to_numpy())
+    else:
+        r, n = pairwise_correlations(values.to_numpy(), targets.to_numpy())
+    t_stat, p_value = correlation_t_test(r, n)
+
+    if significance != 't-test':
+        resampled = resample_correlations(
+            values.to_numpy(), targets.to_numpy(), mode=significance, method=method,
+            resamples=resamples, seed=seed, workers=workers
+        )
+
+    # A target is not correlated with itself
+    for j, target in enumerate(target_columns):
+        if target in numeric_columns:
+            i = numeric_columns.index(target)
+            r[i, j] = t_stat[i, j] = p_value[i, j] = np.nan
+            if significance != 't-test':
+                for result in resampled:
+                    result[i, j] = np.nan
+
+    results = {'Variable': numeric_columns}
+    for j, target in enumerate(target_columns):
+        results[f'Correlation with {target}'] = r[:, j]
+        results[f'T-Statistic with {target}'] = t_stat[:, j]
+        results[f'P-Value with {target}'] = p_value[:, j]
+        if significance == 'permutation':
+            results[f'Permutation P-Value with {target}'] = resampled[0][:, j]
+            adjusted = adjust_p_values(resampled[0][:, j], correction=correction)
+        else:
+            adjusted = adjust_p_values(p_value[:, j], correction=correction)
+        results[f'Adjusted P-Value with {target}'] = adjusted
+
+        if significance == 'bootstrap':
+            lower, upper = resampled[0][:, j], resampled[1][:, j]
+            results[f'CI Lower with {target}'] = lower
+            results[f'CI Upper with {target}'] = upper
+            results[f'Significance with {target}'] = np.where((lower > 0) | (upper < 0), 'High', 'Low')
+        else:
+            results[f'Significance with {target}'] = np.where(adjusted < SIGNIFICANCE_LEVEL, 'High', 'Low')
+
+    return pd.DataFrame(results).sort_values('Variable', ignore_index=True)
+
+
+def resample_correlations(x, y, mode='bootstrap', method='pearson', resamples=RESAMPLES,
+                          confidence=1 - SIGNIFICANCE_LEVEL, seed=0, workers=None):
+    """
+    Resampling tests of the correlations between every column of x and every
+    column of y, 2D float arrays with a row per day.
+
+    mode 'bootstrap' resamples the days with replacement and returns the
+    lower and upper bounds of the percentile confidence interval of each
+    correlation. mode 'permutation' shuffles the days of y against x and
+    returns the two-sided p-value of each correlation, as a one-element
+    tuple.
+
+    The resamples are correlated in batches, vectorized as matrix products
+    over all resamples of a batch, and split into tasks for a process pool of workers processes (default: one per core).
+    Every task gets its own seed derived from seed, so the results are the
+    same for any number of workers.
+    """
+    if mode not in ('bootstrap', 'permutation'):
+        raise ValueError(f'Unknown resampling mode: {mode}')
+    if method == 'spearman' and mode == 'permutation' and not (np.isnan(x).any() or np.isnan(y).any()):
+        # Without missing values shuffling does not change the ranks, so they are computed once
+        x, y, method = _rank(x), _rank(y), 'pearson'
+
+    tasks = [min(RESAMPLES_PER_TASK, resamples - start) for start in range(0, resamples, RESAMPLES_PER_TASK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(tasks))
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    arguments = [(x, y, mode, method, task_resamples, task_seed) for task_resamples, task_seed in zip(tasks, seeds)]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            task_results = list(executor.map(_resample_task, *zip(*arguments)))
+    else:
+        task_results = [_resample_task(*task_arguments) for task_arguments in arguments]
+
+    if mode == 'bootstrap':
+        r = np.concatenate(task_results)
+        # Correlations that are missing in most resamples (e.g. of constant columns) have no interval
+        known = np.isnan(r).mean(axis=0) <= 0.5
+        lower, upper = np.full(known.shape, np.nan), np.full(known.shape, np.nan)
+        lower[known], upper[known] = np.nanpercentile(r[:, known], [50 * (1 - confidence), 50 * (1 + confidence)], axis=0)
+        return lower, upper
+
+    observed, _ = (pairwise_rank_correlations if method == 'spearman' else pairwise_correlations)(x, y)
+    exceeding = sum(task_result[0] for task_result in task_results)
+    valid = sum(task_result[1] for task_result in task_results)
+    # Counting the observed data as one of the permutations keeps the p-value above 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p_value = (exceeding + 1) / (valid + 1)
+    p_value[np.isnan(observed)] = np.nan
+    return (p_value,)
+
+
+def _resample_task(x, y, mode, method, resamples, seed):
+    # Runs in a worker process: the correlations of the bootstrap resamples, or
+    # how often a permutation is at least as strong as the observed correlation
+    rng = np.random.default_rng(seed)
+    rows = len(x)
+    if mode == 'permutation':
+        observed = np.abs((pairwise_rank_correlations if method == 'spearman' else pairwise_correlations)(x, y)[0])
+        exceeding = np.zeros(observed.shape)
+        valid = np.zeros(observed.shape)
+    else:
+        pair_sums = _pair_sums(x, y)
+
+    correlations = []
+    batch = max(1, RESAMPLE_BATCH_BYTES // (8 * rows * max(x.shape[1] * y.shape[1], x.shape[1] + y.shape[1])))
+    for start in range(0, resamples, batch):
+        size = min(batch, resamples - start)
+        if mode == 'bootstrap' and method == 'spearman':
+            # The ranks depend on which days are drawn, so every resample is ranked
+            days = rng.integers(rows, size=(size, rows))
+            r, _ = pairwise_rank_correlations(x[days], y[days])
+        elif mode == 'bootstrap':
+            # A resample is the data weighted by how often each day is drawn, so the
+            # sums of all resamples of the batch are one matrix product
+            days = rng.integers(rows, size=(size, rows)) + rows * np.arange(size)[:, None]
+            weights = np.bincount(days.ravel(), minlength=size * rows).reshape(size, rows).astype(float)
+            sums = [(weights @ pair_sum).reshape(size, x.shape[1], y.shape[1]) for pair_sum in pair_sums]
+            r = _correlations_from_sums(*sums, tolerance=SUMS_TOLERANCE * np.maximum(sums[3], sums[4]))
+        elif method == 'spearman':
+            # With missing values, the days both values are present on depend on the permutation
+            days = rng.permuted(np.broadcast_to(np.arange(rows), (size, rows)), axis=1)
+            r, _ = pairwise_rank_correlations(x, y[days])
+        else:
+            days = rng.permuted(np.broadcast_to(np.arange(rows), (size, rows)), axis=1)
+            r = _permuted_correlations(x, y, days)
+
+        if mode == 'bootstrap':
+            correlations.append(r)
+        else:
+            # A small margin keeps rounding errors from deciding ties
+            exceeding += (np.abs(r) >= observed - 1e-12).sum(axis=0)
+            valid += (~np.isnan(r)).sum(axis=0)
+
+    if mode == 'bootstrap':
+        return np.concatenate(correlations)
+    return exceeding, valid
+
+
+def _pair_sums(x, y):
+    """
+    Per row, the terms of the sums of pairwise_correlations for every pair of
+    a column of x and a column of y, as a matrix with a column per pair.
+    """
+    x, x_mask = _center(x)
+    y, y_mask = _center(y)
+
+    def pairs(a, b):
+        return (a[:, :, None] * b[:, None, :]).reshape(len(a), -1)
+
+    return [
+        pairs(x_mask, y_mask), pairs(x, y_mask), pairs(x_mask, y),
+        pairs(x ** 2, y_mask), pairs(x_mask, y ** 2), pairs(x, y),
+    ]
+
+
+def _permuted_correlations(x, y, days):
+    """
+    Correlations of x with the rows of y in the orders of days, one
+    permutation per row. The permuted copies of y are put side by side, so
+    the sums of all permutations are one matrix product per sum.
+    """
+    size, rows = days.shape
+    x, x_mask = _center(x)
+    y, y_mask = _center(y)
+
+    def side_by_side(values):
+        return np.moveaxis(values[days], 0, 1).reshape(rows, -1)
+
+    y_permuted, y_mask_permuted = side_by_side(y), side_by_side(y_mask)
+    sums = [
+        x_mask.T @ y_mask_permuted, x.T @ y_mask_permuted, x_mask.T @ y_permuted,
+        (x ** 2).T @ y_mask_permuted, x_mask.T @ y_permuted ** 2, x.T @ y_permuted,
+    ]
+    # From variables x (permutations x targets) to permutations x variables x targets
+    sums = [np.moveaxis(pair_sum.reshape(x.shape[1], size, y.shape[1]), 1, 0) for pair_sum in sums]
+    return _correlations_from_sums(*sums, tolerance=SUMS_TOLERANCE * np.maximum(sums[3], sums[4]))
+
+
+def _rank(values):
+    # Average ranks of every column (the second to last axis), keeping missing values
+    return rankdata(values, axis=-2, nan_policy='omit')
+
+
+def correlate_with_survey(merged_dataframe, target_columns=TARGET_COLUMNS, method='pearson', correction='fdr_bh', **options):
+    """
+    Correlate all numeric columns of the merged AWT and survey days with the
+    survey scores (see calculate_significance for the options).
+    """
+    # Automatically select only numeric columns
+    numeric_columns = merged_dataframe.select_dtypes(include='number').columns
+    return calculate_significance(merged_dataframe, numeric_columns, target_columns, method=method, correction=correction, **options)
+
+
+def rolling_correlations(merged_dataframe, target_columns=TARGET_COLUMNS, window_days=30, min_days=ROLLING_MIN_DAYS):
+    """
+    Pearson correlations of all numeric columns of the merged AWT and survey
+    days with the survey scores, over a window of window_days calendar days
+    that slides over the study.
+
+    The sums that a correlation is computed from are kept as running sums
+    over the days, so the sums of a window are the difference between the
+    running sums at its last and first day. Every window costs the same,
+    however long, instead of recomputing the correlations from its days.
+
+    Returns a DataFrame indexed by the last Date of each window, with a column
+    per target and variable (e.g. result['Productivity'] has one column per
+    variable). Windows with fewer than min_days days with both values are
+    missing.
+    """
+    merged_dataframe = merged_dataframe.sort_values('Date')
+    numeric_columns = [
+        column for column in merged_dataframe.select_dtypes(include='number').columns if column not in target_columns
+    ]
+    dates = merged_dataframe['Date'].to_numpy(dtype='datetime64[D]')
+
+    # Positions of the first and after the last day of the window ending at each day
+    first = np.searchsorted(dates, dates - np.timedelta64(window_days - 1, 'D'), side='left')
+    last = np.searchsorted(dates, dates, side='right')
+
+    y, y_mask = _center(merged_dataframe[target_columns].to_numpy(dtype=float))
+    r = np.empty((len(dates), len(numeric_columns), len(target_columns)))
+
+    # The running sums take rows x variables x targets of memory, so the variables are done in blocks
+    for start in range(0, len(numeric_columns), ROLLING_BLOCK_COLUMNS):
+        block = numeric_columns[start:start + ROLLING_BLOCK_COLUMNS]
+        x, x_mask = _center(merged_dataframe[block].to_numpy(dtype=float))
+
+        n = _window_sums(x_mask, y_mask, first, last)
+        sum_x = _window_sums(x, y_mask, first, last)
+        sum_y = _window_sums(x_mask, y, first, last)
+        sum_xx, running_xx = _window_sums(x ** 2, y_mask, first, last, running=True)
+        sum_yy, running_yy = _window_sums(x_mask, y ** 2, first, last, running=True)
+        sum_xy = _window_sums(x, y, first, last)
+
+        r_block = _correlations_from_sums(
+            n, sum_x, sum_y, sum_xx, sum_yy, sum_xy,
+            tolerance=SUMS_TOLERANCE * np.maximum(running_xx, running_yy)
+        )
+        r_block[n < min_days] = np.nan
+        r[:, start:start + len(block)] = r_block
+
+    columns = pd.MultiIndex.from_product([target_columns, numeric_columns], names=['Target', 'Variable'])
+    # Targets first, so that selecting a target gives its correlations with every variable
+    values = r.transpose(0, 2, 1).reshape(len(dates), -1)
+    return pd.DataFrame(values, index=pd.DatetimeIndex(dates, name='Date'), columns=columns)
+
+
+def _window_sums(a, b, first, last, running=False):
+    """
+    Sums of the products of every column of a with every column of b over
+    the rows first up to last of each window, as the difference of running
+    sums. With running, also returns the running sums at the end of each
+    window.
+    """
+    sums = np.zeros((len(a) + 1, a.shape[1], b.shape[1]))
+    np.cumsum(a[:, :, None] * b[:, None, :], axis=0, out=sums[1:])
+    window = sums[last] - sums[first]
+    if running:
+        return window, sums[last]
+    return window
@@ -0,0 +1,187 @@
+"""
+Local columnar store of processed AWT data.
+
+The cleaned events (with their raw titles), the merged work slots and the
+day features of each participant are kept as Parquet files, partitioned by
+month:
+
+    <store_dir>/<participant>/events/2024-03.parquet
+    <store_dir>/<participant>/slots/2024-03.parquet
+    <store_dir>/<participant>/days/2024-03.parquet
+    <store_dir>/<participant>/metadata.json
+
+A new upload only processes the events that begin after the last stored
+event. Those events, together with the stored days they can still affect,
+are merged into work slots and turned into day features again, and the
+partitions from the first affected day onwards are rewritten.
+"""
+
+import json
+import os
+import re
+
+import pandas as pd
+
+from scientist_types.features import build_dataframe_days, concat_dataframe_days, prepare_awt_events
+from scientist_types.slots import build_work_slots, find_day_split
+from scientist_types.titles import DEFAULT_TITLE_RULES
+
+# Default location of the store, relative to the working directory
+DEFAULT_STORE_DIR = os.environ.get('AWT_STORE_DIR', 'awt_store')
+
+TABLES = ('events', 'slots', 'days')
+
+# Increase when the stored layout or the computed features change
+STORE_VERSION = 5
+
+
+def _participant_dir(store_dir, participant):
+    # Participant names become directory names
+    if not re.fullmatch(r'[A-Za-z0-9_-]+', participant):
+        raise ValueError('Participant names may only contain letters, digits, underscores and hyphens.')
+    return os.path.join(store_dir, participant)
+
+
+def _row_dates(table, dataframe):
+    column = 'Date' if table == 'days' else 'Begin'
+    return dataframe[column].dt.normalize()
+
+
+def _stored_months(participant_dir, table):
+    table_dir = os.path.join(participant_dir, table)
+    if not os.path.isdir(table_dir):
+        return []
+    return sorted(name[:-len('.parquet')] for name in os.listdir(table_dir) if name.endswith('.parquet'))
+
+
+def _read_months(participant_dir, table, months):
+    frames = [pd.read_parquet(os.path.join(participant_dir, table, f'{month}.parquet')) for month in months]
+    if table == 'days':
+        return concat_dataframe_days(frames)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _replace_from(participant_dir, table, dataframe, start_date):
+    """
+    Replace the stored rows of a table from start_date onwards.
+    """
+    table_dir = os.path.join(participant_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+    start_month = start_date.strftime('%Y-%m')
+
+    # Remove the partitions after the start month; they are fully replaced
+    for month in _stored_months(participant_dir, table):
+        if month > start_month:
+            os.remove(os.path.join(table_dir, f'{month}.parquet'))
+
+    # Keep the rows before start_date in the start month
+    if start_month in _stored_months(participant_dir, table):
+        kept = _read_months(participant_dir, table, [start_month])
+        kept = kept[_row_dates(table, kept) < start_date]
+        # Without kept rows, columns that are no longer computed are not carried over
+        if not kept.empty:
+            dataframe = (concat_dataframe_days if table == 'days' else pd.concat)([kept, dataframe])
+
+    months = _row_dates(table, dataframe).dt.strftime('%Y-%m')
+    for month, partition in dataframe.groupby(months):
+        partition.reset_index(drop=True).to_parquet(os.path.join(table_dir, f'{month}.parquet'), index=False)
+
+
+def read_metadata(store_dir, participant):
+    path = os.path.join(_participant_dir(store_dir, participant), 'metadata.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def _write_metadata(participant_dir, metadata):
+    with open(os.path.join(participant_dir, 'metadata.json'), 'w') as file:
+        json.dump(metadata, file)
+
+
+def update_store(store_dir, participant, dataframe_awt, tolerance=0, title_rules=None):
+    """
+    Add the cleaned AWT events (see load_awt_data) of a participant to the
+    store and recompute the affected work slots and days.
+
+    Only events that begin after the last stored event are added, so the
+    full export can be uploaded again every time. When the store was created
+    with a different slot merge tolerance, other title rules than
+    title_rules (the rules the events were cleaned with, see
+    titles.TitleRules) or an older STORE_VERSION, the work slots and days
+    are computed again from all stored events and the new ones; the stored
+    events are kept. Returns the dates whose features were (re)computed.
+    """
+    participant_dir = _participant_dir(store_dir, participant)
+    metadata = read_metadata(store_dir, participant)
+    title_rules_digest = (title_rules or DEFAULT_TITLE_RULES).digest
+
+    if metadata is None:
+        # Start a new store from all events
+        os.makedirs(participant_dir, exist_ok=True)
+        affected_events = dataframe_awt.reset_index(drop=True)
+    else:
+        new_events = dataframe_awt[dataframe_awt['Begin'] > pd.Timestamp(metadata['last_begin'])]
+        stored_months = _stored_months(participant_dir, 'events')
+
+        if (
+            metadata['version'] != STORE_VERSION
+            or metadata['tolerance'] != tolerance
+            or metadata.get('title_rules') != title_rules_digest
+        ):
+            # The stored events do not depend on these settings, so all
+            # stored days are computed again from them. Their raw titles are
+            # cleaned again, in case the title rules changed
+            stored_events = _read_months(participant_dir, 'events', stored_months)
+            stored_events = (title_rules or DEFAULT_TITLE_RULES).apply(stored_events)
+            affected_events = pd.concat([stored_events, new_events], ignore_index=True)
+        else:
+            if new_events.empty:
+                return []
+
+            # Load stored months from the last one backwards until no work slot
+            # runs from an unloaded month into the last stored day
+            last_stored_date = pd.Timestamp(metadata['last_begin']).normalize()
+            loaded = 1
+            while True:
+                stored_events = _read_months(participant_dir, 'events', stored_months[-loaded:])
+                combined = pd.concat([stored_events, new_events], ignore_index=True)
+                split = find_day_split(combined, split_date=last_stored_date, tolerance=tolerance)
+                if split > 0 or loaded == len(stored_months):
+                    break
+                loaded += 1
+            affected_events = combined.iloc[split:].reset_index(drop=True)
+
+    if affected_events.empty:
+        return []
+
+    # Recompute the work slots and day features of the affected days
+    dataframe_merged_awt = build_work_slots(affected_events, tolerance=tolerance)
+    dataframe_days = build_dataframe_days(prepare_awt_events(affected_events), dataframe_merged_awt)
+
+    # Slot IDs are only unique within one computation, so they are not stored
+    dataframe_merged_awt = dataframe_merged_awt.drop(columns=['Slot'])
+
+    start_date = dataframe_days['Date'].min()
+    for table, dataframe in zip(TABLES, (affected_events, dataframe_merged_awt, dataframe_days)):
+        _replace_from(participant_dir, table, dataframe, start_date)
+
+    _write_metadata(participant_dir, {
+        'version': STORE_VERSION,
+        'tolerance': tolerance,
+        'title_rules': title_rules_digest,
+        'last_begin': affected_events['Begin'].max().isoformat(),
+    })
+    return list(dataframe_days['Date'])
+
+
+def read_table(store_dir, participant, table):
+    """
+    Read a stored table ('events', 'slots' or 'days') of a participant.
+    """
+    participant_dir = _participant_dir(store_dir, participant)
+    months = _stored_months(participant_dir, table)
+    if not months:
+        raise FileNotFoundError(f'No stored {table} for participant {participant!r}.')
+    return _read_months(participant_dir, table, months)
@@ -0,0 +1,109 @@
+"""
+Chunked processing of Tockler exports that are too large to load at once.
+
+The export is read in chunks of rows. Events are assumed to be in
+chronological order, as Tockler exports them. The events of the last,
+possibly unfinished day of every chunk are carried over to the next chunk,
+so the features of a day are computed once all of its events and work
+slots have been read. Only the carried over events and one chunk are held
+in memory at a time.
+
+Several exports of consecutive periods are read one after the other, in
+the order of their first event.
+"""
+
+import pandas as pd
+
+from scientist_types.features import build_dataframe_days, concat_dataframe_days, prepare_awt_events
+from scientist_types.ingest import LATIN1_FALLBACK, clean_awt_data, combine_awt_data, parse_timestamps, sniff_file
+from scientist_types.slots import build_work_slots, find_day_split
+
+# Number of CSV rows read per chunk
+DEFAULT_CHUNKSIZE = 200_000
+
+
+def _first_begin(file, delimiter, datetime_format):
+    # Peek at the first event of an export, rewinding file objects afterwards
+    position = file.tell() if hasattr(file, 'tell') else None
+    encoding, sniffed_delimiter = sniff_file(file)
+    first_rows = pd.read_csv(file, delimiter=delimiter or sniffed_delimiter, encoding=encoding, usecols=['Begin'], nrows=1)
+    if position is not None:
+        file.seek(position)
+    first_begin = parse_timestamps(first_rows['Begin'], datetime_format=datetime_format).min()
+    return pd.Timestamp.max if pd.isna(first_begin) else first_begin
+
+
+def _read_chunks(files, delimiter, chunksize, datetime_format, title_rules):
+    # Chunks of cleaned events of all exports; events of an export that begin
+    # before the last event of the previous exports are in both, and skipped.
+    # The last event itself is read again: an export that ended while its
+    # window was still open has an earlier End for it, and the copy with the
+    # latest End is kept when the chunks are combined
+    previous_last_begin = None
+    for file in files:
+        last_begin = previous_last_begin
+        encoding, sniffed_delimiter = sniff_file(file)
+        # The encoding is detected from the first bytes only; the file cannot be read
+        # again from the start once chunks are processed, so invalid UTF-8 is read as Latin-1
+        reader = pd.read_csv(
+            file, delimiter=delimiter or sniffed_delimiter, encoding=encoding,
+            encoding_errors=LATIN1_FALLBACK if encoding == 'utf-8' else 'strict', chunksize=chunksize
+        )
+        for chunk in reader:
+            chunk = clean_awt_data(chunk, datetime_format=datetime_format, title_rules=title_rules)
+            if previous_last_begin is not None:
+                chunk = chunk[chunk['Begin'] >= previous_last_begin]
+            if not chunk.empty:
+                last_begin = max(last_begin, chunk['Begin'].max()) if last_begin is not None else chunk['Begin'].max()
+            yield chunk
+        previous_last_begin = last_begin
+
+
+def stream_dataframe_days(file, delimiter=None, tolerance=0, chunksize=DEFAULT_CHUNKSIZE, datetime_format=None, title_rules=None):
+    """
+    Compute dataframe_days from a Tockler CSV export (a path or binary file
+    object), or a list of exports of consecutive periods, in chunks of rows.
+
+    Gives the same result as building the days from the fully loaded export,
+    provided its days are in chronological order; the events within the days
+    in memory are sorted. The encoding and, unless
+    given, the delimiter of every export are detected from its first bytes.
+    Titles are normalized and classified with title_rules (see
+    titles.TitleRules).
+    """
+    files = file if isinstance(file, list) else [file]
+    if len(files) > 1:
+        files = sorted(files, key=lambda file: _first_begin(file, delimiter, datetime_format))
+
+    day_frames = []
+    carried = None
+    last_completed_date = None
+
+    for chunk in _read_chunks(files, delimiter, chunksize, datetime_format, title_rules):
+        # Sorted and deduplicated like a fully loaded export (see combine_awt_data), so
+        # events that are out of order within the days in memory give the same work slots
+        chunk = combine_awt_data([chunk] if carried is None else [carried, chunk])
+        if chunk.empty:
+            continue
+
+        if last_completed_date is not None and chunk['Begin'].min().normalize() <= last_completed_date:
+            raise ValueError('Streaming ingestion requires the AWT events to be sorted by Begin time.')
+
+        split = find_day_split(chunk, tolerance=tolerance)
+        completed, carried = chunk.iloc[:split], chunk.iloc[split:].reset_index(drop=True)
+        if completed.empty:
+            continue
+
+        dataframe_merged_awt = build_work_slots(completed, tolerance=tolerance)
+        day_frames.append(build_dataframe_days(prepare_awt_events(completed), dataframe_merged_awt))
+        last_completed_date = day_frames[-1]['Date'].max()
+
+    # The events of the last day are complete once the whole export has been read
+    if carried is not None and not carried.empty:
+        dataframe_merged_awt = build_work_slots(carried, tolerance=tolerance)
+        day_frames.append(build_dataframe_days(prepare_awt_events(carried), dataframe_merged_awt))
+
+    if not day_frames:
+        raise ValueError('The AWT file does not contain any events.')
+
+    return concat_dataframe_days(day_frames)
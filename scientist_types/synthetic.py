@@ -0,0 +1,114 @@
+"""
+Synthetic Tockler exports and survey results, for benchmarks and demos.
+
+The generated data looks like a real export: working days start in the
+morning, weekends are quieter, a few apps take most of the time, and every
+app has its own window titles. Windows mostly follow each other directly,
+with occasional short gaps and longer breaks.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scientist_types.stats import TARGET_COLUMNS
+
+# Format of the Begin and End columns in a Tockler export
+TOCKLER_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Format of the Date column of the survey results
+SURVEY_DATE_FORMAT = '%d-%m-%Y'
+
+# Names of the most used apps; further apps are numbered
+COMMON_APPS = [
+    'Microsoft Outlook', 'Google Chrome', 'Microsoft Teams', 'Microsoft Word',
+    'Microsoft Excel', 'Adobe Acrobat', 'Code', 'Slack', 'Firefox', 'Zotero',
+]
+
+# Gaps between windows in seconds and how often they occur
+GAPS = np.array([0, 1, 5, 30, 300, 1800])
+GAP_PROBABILITIES = np.array([0.8, 0.08, 0.05, 0.04, 0.02, 0.01])
+
+
+def app_names(apps):
+    return COMMON_APPS[:apps] + [f'App {number}' for number in range(len(COMMON_APPS) + 1, apps + 1)]
+
+
+def generate_awt_data(days=30, events_per_day=300, apps=20, titles=500, start='2024-01-01', seed=0):
+    """
+    A synthetic Tockler export with the columns App, Type, Title, Begin and
+    End, in chronological order.
+
+    events_per_day is the average number of windows on a working day, apps
+    and titles the number of distinct apps and window titles.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq='D')
+
+    # Weekends have about a fifth of the windows of a working day
+    weekend = dates.dayofweek >= 5
+    day_events = rng.poisson(np.where(weekend, events_per_day / 5, events_per_day))
+    day_index = np.repeat(np.arange(days), day_events)
+    total = len(day_index)
+
+    # Apps and titles are Zipf-like distributed: a few are used most of the time
+    app_weights = 1 / np.arange(1, apps + 1)
+    app_codes = rng.choice(apps, size=total, p=app_weights / app_weights.sum())
+    title_weights = 1 / np.arange(1, titles + 1) ** 0.8
+    title_codes = rng.choice(titles, size=total, p=title_weights / title_weights.sum())
+
+    # Titles belong to the app that uses them most; some windows have no title
+    names = np.array(app_names(apps), dtype=object)
+    title_apps = names[np.arange(titles) % apps]
+    title_names = title_apps + ' - Document ' + np.arange(1, titles + 1).astype(str).astype(object)
+    event_titles = np.where(rng.random(total) < 0.03, 'NO_TITLE', title_names[title_codes])
+    event_apps = np.where(rng.random(total) < 0.7, title_apps[title_codes], names[app_codes])
+
+    # Windows last a few seconds to several minutes, and follow each other within a day
+    durations = np.ceil(rng.lognormal(mean=3.5, sigma=1.2, size=total)).astype('int64')
+    gaps = rng.choice(GAPS, size=total, p=GAP_PROBABILITIES)
+    offsets = np.cumsum(durations + gaps) - durations
+    day_starts = np.concatenate([[0], np.cumsum(day_events)[:-1]])
+    if total:
+        offsets -= np.repeat(offsets[np.minimum(day_starts, total - 1)], day_events)
+
+    # Days start between 7:00 and 10:00
+    first_begin = dates.values + (rng.uniform(7, 10, size=days) * 3600).astype('int64').astype('timedelta64[s]')
+    begin = first_begin[day_index] + offsets.astype('timedelta64[s]')
+    end = begin + durations.astype('timedelta64[s]')
+
+    return pd.DataFrame({
+        'App': event_apps,
+        'Type': 'app',
+        'Title': event_titles,
+        'Begin': pd.DatetimeIndex(begin).strftime(TOCKLER_DATETIME_FORMAT),
+        'End': pd.DatetimeIndex(end).strftime(TOCKLER_DATETIME_FORMAT),
+    })
+
+
+def generate_survey_data(dataframe_awt, response_rate=0.8, seed=0):
+    """
+    Survey results for the days of a synthetic export, with scores from 1 to
+    7 that are loosely related to the time spent on the computer.
+
+    Not every day has a response; response_rate is the share of days that do.
+    """
+    rng = np.random.default_rng(seed)
+    begin = pd.to_datetime(dataframe_awt['Begin'], format=TOCKLER_DATETIME_FORMAT)
+    end = pd.to_datetime(dataframe_awt['End'], format=TOCKLER_DATETIME_FORMAT)
+    hours = (end - begin).dt.total_seconds().groupby(begin.dt.normalize()).sum() / 3600
+
+    responded = hours[rng.random(len(hours)) < response_rate]
+    standardized = (responded - hours.mean()) / (hours.std() or 1)
+
+    survey = pd.DataFrame({'Date': responded.index.strftime(SURVEY_DATE_FORMAT)})
+    for column in TARGET_COLUMNS:
+        noise = rng.normal(size=len(responded))
+        survey[column] = np.clip(np.round(4 + standardized.values + noise), 1, 7).astype(int)
+    return survey
+
+
+def to_csv_bytes(dataframe, delimiter=','):
+    """
+    The DataFrame as the bytes of a CSV file, like an uploaded file.
+    """
+    return dataframe.to_csv(index=False, sep=delimiter).encode('utf-8')
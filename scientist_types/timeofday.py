@@ -0,0 +1,40 @@
+"""
+Vectorized time-of-day features.
+
+Times of day are decimal hours since the midnight that starts the day they
+are attributed to, at second precision. A time after midnight that still
+belongs to the previous day (e.g. the end of a late work session) is
+therefore larger than 24 instead of wrapping around to the early morning.
+"""
+
+
+def wall_time(timestamps, tz=None):
+    """
+    Local wall time of a Series of timestamps as naive datetime64.
+
+    Timezone-aware timestamps are converted to tz (when given) before the
+    timezone is dropped; naive timestamps are returned as they are.
+    """
+    if timestamps.dt.tz is None:
+        return timestamps
+    if tz is not None:
+        timestamps = timestamps.dt.tz_convert(tz)
+    return timestamps.dt.tz_localize(None)
+
+
+def decimal_hours(timestamps, day=None, tz=None):
+    """
+    Decimal hours of timestamps since the midnight of day (by default the
+    day of each timestamp itself). Missing timestamps give NaN.
+    """
+    timestamps = wall_time(timestamps, tz=tz)
+    if day is None:
+        day = timestamps.dt.normalize()
+    return (timestamps - day).dt.total_seconds() / 3600
+
+
+def midpoint(begin, end):
+    """
+    Midpoint between begin and end timestamps.
+    """
+    return begin + (end - begin) / 2
@@ -0,0 +1,146 @@
+"""
+Normalization and classification of window titles.
+
+Titles that only differ in details added by the app, e.g. "Document1 - Word"
+and "Document1 - Word (autosaved)", belong to the same task. TitleRules
+removes such details from the titles and classifies the titles into
+activity categories (meeting, email, writing, ...) with regular expressions.
+
+The patterns are compiled into one combined regular expression for the
+normalization and one for the classification, and the result is memoized
+per title. Titles are handled as the categories of the categorical Title
+column, so millions of events cost as much as their unique titles.
+"""
+
+import hashlib
+import json
+import re
+
+import numpy as np
+import pandas as pd
+
+# Details removed from titles, as (pattern, replacement). All patterns are
+# applied in a single pass, after which whitespace is collapsed
+NORMALIZATION_RULES = [
+    (r'\s*[(\[](?:autosaved|autorecovered|read-only|compatibility mode|protected view|repaired)[)\]]', ''),
+    (r' - (?:saved|saving(?:\.\.\.|…)?)(?: to [^-]+?)?(?= - )', ''),
+    # Unread counts, e.g. "(3) Inbox - Outlook"
+    (r'^\(\d+\)\s+', ''),
+    # Markers of unsaved changes, e.g. "*notes.txt - Notepad" or "● script.py - Code"
+    (r'^[*●•]\s*|\s*[*●•]$', ''),
+]
+
+# Activity categories as (category, pattern). A title gets the category of
+# the pattern that matches earliest in the (normalized) title; when several
+# match at the same position, the first rule wins
+CATEGORY_RULES = [
+    ('Meeting', r'\bmeeting\b|\bzoom\b|\bwebex\b|google meet|meet\.google\.com'),
+    ('Email', r'\binbox\b|\boutlook\b|\bgmail\b|\bthunderbird\b|\bmessage \((?:html|plain text|rich text)\)'),
+    ('Writing', r'\.(?:docx?|odt|rtf|tex|md)\b|\boverleaf\b|google docs| - word$'),
+    ('Reading', r'\.pdf\b|\bacrobat\b|\bzotero\b|\bmendeley\b'),
+    ('Data analysis', r'\.(?:xlsx?|csv|ipynb|py|r|rmd|sav)\b| - excel$|\bjupyter\b|\brstudio\b|\bspss\b|\bstata\b'),
+    ('Chat', r'\bchat\b|\bslack\b|\bwhatsapp\b'),
+]
+
+# Number of titles whose results are memoized before the memo is cleared
+TITLE_CACHE_SIZE = 100_000
+
+
+def _combine(patterns):
+    # One case-insensitive regular expression with a named group per pattern
+    if not patterns:
+        return None
+    return re.compile('|'.join(f'(?P<rule{i}>{pattern})' for i, pattern in enumerate(patterns)), re.IGNORECASE)
+
+
+def _rule_number(match):
+    # The outer group of a rule closes last, so it is the last group of the match
+    return int(match.lastgroup[len('rule'):])
+
+
+class TitleRules:
+    """
+    Compiled normalization rules, a list of (pattern, replacement), and
+    category rules, a list of (category, pattern). Raises re.error when a
+    pattern is invalid. Patterns are numbered groups of the combined
+    expression, so they cannot refer to their own groups by number.
+    """
+
+    def __init__(self, normalization=NORMALIZATION_RULES, categories=CATEGORY_RULES):
+        self.normalization = [tuple(rule) for rule in normalization]
+        self.categories = [tuple(rule) for rule in categories]
+        self.category_names = list(dict.fromkeys(category for category, _ in self.categories))
+        self._normalizer = _combine([pattern for pattern, _ in self.normalization])
+        self._classifier = _combine([pattern for _, pattern in self.categories])
+        self._results = {}
+
+    @property
+    def digest(self):
+        """
+        A hash of the rules, to tell data processed with other rules apart.
+        """
+        return hashlib.sha256(json.dumps([self.normalization, self.categories]).encode()).hexdigest()
+
+    def _replace(self, match):
+        return self.normalization[_rule_number(match)][1]
+
+    def classify(self, title):
+        """
+        The normalized title and its category (None if no rule matches).
+        """
+        result = self._results.get(title)
+        if result is None:
+            normalized = self._normalizer.sub(self._replace, title) if self._normalizer else title
+            # A title that consists of removed details only is kept as it is
+            normalized = ' '.join(normalized.split()) or title
+            match = self._classifier.search(normalized) if self._classifier else None
+            result = (normalized, self.categories[_rule_number(match)][0] if match else None)
+
+            if len(self._results) >= TITLE_CACHE_SIZE:
+                self._results.clear()
+            self._results[title] = result
+        return result
+
+    def apply(self, dataframe_awt):
+        """
+        Normalize the Title column of the AWT events and add their Category,
+        both as categoricals. Every unique title is classified once.
+
+        The original titles are kept as the Raw Title column, which is used
+        instead of Title when present, so events can be cleaned again with
+        other rules.
+        """
+        titles = dataframe_awt['Raw Title' if 'Raw Title' in dataframe_awt.columns else 'Title'].astype('category')
+        results = [self.classify(str(title)) for title in titles.cat.categories]
+        codes = titles.cat.codes.to_numpy()
+
+        # Map the codes of the raw titles to those of the normalized titles and the categories
+        title_codes, normalized_titles = pd.factorize(pd.Index([normalized for normalized, _ in results], dtype=object))
+        category_codes = pd.Categorical([category for _, category in results], categories=self.category_names).codes
+
+        dataframe_awt = dataframe_awt.copy()
+        dataframe_awt['Raw Title'] = titles
+        dataframe_awt['Title'] = pd.Categorical.from_codes(
+            np.where(codes >= 0, title_codes[codes], -1) if len(results) else codes, categories=normalized_titles
+        )
+        dataframe_awt['Category'] = pd.Categorical.from_codes(
+            np.where(codes >= 0, category_codes[codes], -1) if len(results) else codes, categories=self.category_names
+        )
+        return dataframe_awt
+
+
+DEFAULT_TITLE_RULES = TitleRules()
+
+
+def read_title_rules(path):
+    """
+    Read TitleRules from a JSON file with a 'normalization' list of
+    [pattern, replacement] pairs and a 'categories' list of [category,
+    pattern] pairs. A missing list keeps the built-in rules.
+    """
+    with open(path) as file:
+        rules = json.load(file)
+    return TitleRules(
+        normalization=rules.get('normalization', NORMALIZATION_RULES),
+        categories=rules.get('categories', CATEGORY_RULES),
+    )
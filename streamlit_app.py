@@ -1,13 +1,26 @@
-import numpy as np
 import pandas as pd
 import streamlit as st
 import json
-from io import StringIO
 from datetime import datetime, timedelta
 import re
-import csv
 import altair as alt
-import zipfile
+import hashlib
+import time
+import uuid
+
+from scientist_types.charts import box_plot_summary, melt_variables
+from scientist_types.batch import analyze_data
+from scientist_types.features import build_dataframe_days, limit_app_columns, prepare_awt_events
+from scientist_types.ingest import load_awt_files, open_awt_files, load_survey_data
+from scientist_types.pipeline import Pipeline
+from scientist_types.profiling import Profiler, profile_call
+from scientist_types.rules import REFERENCED_APPS, RULES, SCIENTIST_TYPES, evaluate_rules, score_scientist_types, score_scientist_types_over_time
+from scientist_types.slots import build_work_slots
+from scientist_types.stats import RESAMPLES, ROLLING_MIN_DAYS, TARGET_COLUMNS, correlate_with_survey, merge_survey, rolling_correlations
+from scientist_types.server import SERVER_MODE, JobQueue, SessionCache, SessionStore, process_awt_days
+from scientist_types.store import DEFAULT_STORE_DIR, read_table, update_store
+from scientist_types.titles import CATEGORY_RULES, NORMALIZATION_RULES, TitleRules
+from scientist_types.streaming import stream_dataframe_days
 
 """
 # Productivity Analysis
@@ -18,111 +31,272 @@ with st.sidebar:
     # Load AWT data
     st.header('Upload your data')
     st.markdown('**1. AWT data**')
-    awt_uploaded_file = st.file_uploader("Upload your Tockler data here. You can export your data by going to Tockler > Search > Set a time period > Export to CSV.")
-    # Add a selectbox to choose delimiter
-    delimiter = st.radio(
-        "Select the delimiter used in your CSV file:",
-        options=[',', ';'],
-        index=0,  # Default to comma
-        horizontal=True
+    awt_uploaded_files = st.file_uploader(
+        "Upload your Tockler data here. You can export your data by going to Tockler > Search > Set a time period > Export to CSV. "
+        "The delimiter and encoding are detected automatically. You can upload several exports (e.g. one per month) at once, or a ZIP file of them.",
+        accept_multiple_files=True
+    )
+    # Allow small gaps between events to still count as one work slot
+    slot_merge_tolerance = st.number_input(
+        "Maximum gap (in seconds) between windows to merge them into one work slot:",
+        min_value=0,
+        value=0,
+        step=1
+    )
+    # Process large exports in chunks instead of loading them at once
+    low_memory_mode = st.toggle(
+        "Low-memory mode for large exports",
+        value=False,
+        help="Reads the AWT file in chunks and only keeps the per-day results. Requires the events to be in chronological order."
+    )
+    # Keep processed data between uploads, so only new events have to be processed
+    participant_id = st.text_input(
+        "Participant ID for the local data store (optional):",
+        help="Stores the processed data on this machine. When you upload a newer export later, only the new events are processed. Not used in low-memory mode."
     )
 
-    # Load Survey results data
-    st.markdown('**2. Survey results**')
-    survey_uploaded_file = st.file_uploader("Upload your survey results here. The CSV should contain 5 columns: Date, Productivity, Vigor, Dedication, Absorption.")
-
-# Main section for processing AWT data
-if awt_uploaded_file is not None:
-    try:
-        # Read the uploaded CSV file into a string
-        awt_stringio = StringIO(awt_uploaded_file.getvalue().decode('latin1'))
-
-        # Read the CSV file into a DataFrame using the selected delimiter
-        try:
-            dataframe_awt = pd.read_csv(awt_stringio, delimiter=delimiter)
-        except Exception as e:
-            st.error(f"An error occurred while reading the CSV file: {e}")
-
-        # Check if the first column name is not 'App'
-        if dataframe_awt.columns[0] != 'App':
-            # Rename the first column to 'App'
-            dataframe_awt.rename(columns={dataframe_awt.columns[0]: 'App'}, inplace=True)
-
-        # Convert 'Begin' column to datetime with the specified format
-        if 'Begin' in dataframe_awt.columns:
-            dataframe_awt['Begin'] = pd.to_datetime(dataframe_awt['Begin'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+    # Choose how the survey scores are correlated with the AWT data
+    correlation_method = st.radio(
+        "Correlation method:",
+        options=['Pearson', 'Spearman'],
+        index=0,
+        horizontal=True
+    )
 
-        # Convert 'End' column to datetime with the specified format
-        if 'End' in dataframe_awt.columns:
-            dataframe_awt['End'] = pd.to_datetime(dataframe_awt['End'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M:%S')
+    # Choose how the significance of the correlations is tested
+    significance_test = st.radio(
+        "Significance test:",
+        options=['t-test', 'Bootstrap', 'Permutation'],
+        index=0,
+        horizontal=True,
+        help=f"The bootstrap and permutation tests resample the days {RESAMPLES} times. They are more reliable when there are few days of survey results, but take longer. The bootstrap adds a 95% confidence interval to each correlation."
+    )
 
-        # Drop the 'Type' column if it exists
-        if 'Type' in dataframe_awt.columns:
-            dataframe_awt = dataframe_awt.drop(columns=['Type'])
+    # Apps beyond this number (by time spent) are combined into 'Other apps'
+    max_apps = st.number_input(
+        "Maximum number of apps to analyse separately:",
+        min_value=10,
+        value=50,
+        step=10
+    )
 
-        # Display the first 5 rows of the dataframe
-        #st.write("Snippet of the raw AWT data:")
-        #st.write(dataframe_awt)
+    # Rules that clean the window titles and classify them into activity categories
+    with st.popover('Change Title Rules'):
+        st.caption('Patterns are regular expressions and ignore case. Titles that are the same after cleaning count as one title; the time per category is added to the analysis as Time on [Category].')
+        normalization_rules = st.data_editor(
+            pd.DataFrame(NORMALIZATION_RULES, columns=['Pattern', 'Replacement']),
+            num_rows="dynamic",
+            use_container_width=True,
+            key='normalization_rules'
+        )
+        category_rules = st.data_editor(
+            pd.DataFrame(CATEGORY_RULES, columns=['Category', 'Pattern']),
+            num_rows="dynamic",
+            use_container_width=True,
+            key='category_rules'
+        )
 
-        # Remove rows where 'Begin' is empty
-        dataframe_awt = dataframe_awt.dropna(subset=['Begin'])
-        dataframe_awt = dataframe_awt[dataframe_awt['Begin'] != '']
+    # Rows without a pattern (e.g. just added) are skipped
+    normalization_rules = normalization_rules.dropna(subset=['Pattern']).fillna({'Replacement': ''})
+    category_rules = category_rules.dropna(subset=['Category', 'Pattern'])
+    try:
+        title_rules = TitleRules(
+            normalization=normalization_rules[['Pattern', 'Replacement']].itertuples(index=False),
+            categories=category_rules[['Category', 'Pattern']].itertuples(index=False)
+        )
+    except re.error as e:
+        st.error(f"Invalid title rule: {e}")
+        st.stop()
 
-        # Remove rows where 'Title' is 'NO_TITLE'
-        dataframe_awt = dataframe_awt[~dataframe_awt['Title'].isin(['NO_TITLE', 'Windows Default Lock Screen'])]
+    # Load Survey results data
+    st.markdown('**2. Survey results**')
+    survey_uploaded_file = st.file_uploader("Upload your survey results here. The CSV should contain 5 columns: Date, Productivity, Vigor, Dedication, Absorption.")
 
-        # Initialize lists to store merged rows
-        merged_rows = []
+    # Measure the processing steps, shown in a diagnostics panel at the bottom of the page
+    collect_diagnostics = st.toggle(
+        "Show diagnostics",
+        value=False,
+        help="Measures the time, peak memory and number of rows of each processing step. Makes the processing a little slower."
+    )
 
-        # Convert 'App' column to string
-        dataframe_awt['App'] = dataframe_awt['App'].astype(str)
+profiler = Profiler(enabled=collect_diagnostics)
+
+# The tab icon, description and job crafting advice of every scientist type
+SCIENTIST_TYPE_TEXTS = {
+    'Social scientist': (
+        '🐶',
+        "*Feels productive when helping coworkers, collaborating and doing code reviews [providing feedback]. To get things done, they come early to work or work late and try to focus on a single task*",
+        "If you tick a lot of boxes here, you might consider seeking more interactions, e.g., by going to the office to work, or scheduling office hours for your daily chats."
+    ),
+    'Lone scientist': (
+        '🐺',
+        "*Avoids disruptions such as noise, email, meetings, and code reviews [feedback sessions]. They feel most productive when they have little to no social interactions and when they can work on solving problems, fixing bugs or coding features [writing] in quiet and without interruptions. To reflect about work, they are mostly interested in knowing the frequency and duration of interruptions they encountered.*",
+        "If you tick a lot of boxes here, you might consider tuning down possible interruptions, i.e., by blocking messages and finding quiet working spaces."
+    ),
+    'Focused scientist': (
+        '🐱',
+        "*Feels most productive when they are working efficiently and concentrated on a single task at a time. They are feeling unproductive when they are wasting time and spend too much time on a task, because they are stuck or working slowly. They are interested in knowing the number of interruptions and focused time.*",
+        "If you tick a lot of boxes here, you might consider blocking time for particular tasks, which you have to finish before moving on to the next. Finding a quiet office space might help."
+    ),
+    'Balanced scientist': (
+        '🐨',
+        "*Is less affected by disruptions. They are less likely to come early to work or work late. They are feeling unproductive, when tasks are unclear or irrelevant, they are unfamiliar with a task, or when tasks are causing overhead.*",
+        "If you tick a lot of boxes here, you might consider varying your daily tasks and taking sufficient breaks to avoid boredom and tiredness."
+    ),
+    'Leading scientist': (
+        '🐯',
+        "*Is more comfortable with meetings and emails and feel less productive with coding [writing] activities than other developers [scientists]. They feel more productive in the afternoon and when they can write and design things. They don’t like broken builds and blocking tasks [?], preventing them (or the team) from doing productive work.*",
+        "If you tick a lot of boxes here, you might consider mostly scheduling meetings in the morning, with sufficient time in between, and block time for creation in the afternoons."
+    ),
+    'Goal-oriented scientist': (
+        '🐘',
+        "*Feels productive when they complete or make progress on tasks. They feel less productive when they multi-task, are goal-less or are stuck. They are more open to meetings and emails compared to the other clusters, in case they help them achieve their goals.*",
+        "If you tick a lot of boxes here, you might consider turning down or re-scheduling meetings without a clear goal, or steering the meeting towards a goal yourself."
+    ),
+}
+
+# Processed uploads are cached by the hash of their content, so reruns caused by
+# widget interactions do not parse and merge the same file again
+CACHE_MAX_ENTRIES = 8
+
+
+def hash_file(uploaded_file):
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+
+def hash_files(uploaded_files):
+    # The same files in another order give the same hash
+    return hashlib.sha256(''.join(sorted(hash_file(uploaded_file) for uploaded_file in uploaded_files)).encode()).hexdigest()
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner='Processing AWT data...')
+def process_awt_file(file_hash, _files, tolerance, title_rules_digest, _title_rules, _profiler):
+    # The files, title rules and profiler are excluded from Streamlit's hashing; file_hash
+    # and title_rules_digest are their keys
+    with _profiler.stage('Parse AWT data') as stage:
+        dataframe_awt = load_awt_files(_files, title_rules=_title_rules)
+        stage['rows_out'] = len(dataframe_awt)
+    with _profiler.stage('Merge work slots', rows_in=len(dataframe_awt)) as stage:
+        dataframe_merged_awt = build_work_slots(dataframe_awt, tolerance=tolerance)
+        stage['rows_out'] = len(dataframe_merged_awt)
+    with _profiler.stage('Day features', rows_in=len(dataframe_awt)) as stage:
+        dataframe_days = build_dataframe_days(prepare_awt_events(dataframe_awt), dataframe_merged_awt)
+        stage['rows_out'] = len(dataframe_days)
+    # Only the day features are cached; the events and work slots are not used after this
+    return dataframe_days
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner='Processing AWT data in chunks...')
+def process_awt_file_in_chunks(file_hash, _files, tolerance, title_rules_digest, _title_rules, _profiler):
+    # Only the per-day features are kept; the events are never loaded at once
+    with _profiler.stage('Day features in chunks') as stage:
+        exports = [file for _, file in open_awt_files(_files)]
+        dataframe_days = stream_dataframe_days(exports, tolerance=tolerance, title_rules=_title_rules)
+        stage['rows_out'] = len(dataframe_days)
+    return dataframe_days
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner='Updating the local data store...')
+def process_awt_file_with_store(file_hash, _files, tolerance, title_rules_digest, _title_rules, participant, _profiler):
+    # Only events newer than the stored ones are merged and turned into day features
+    with _profiler.stage('Parse AWT data') as stage:
+        dataframe_awt = load_awt_files(_files, title_rules=_title_rules)
+        stage['rows_out'] = len(dataframe_awt)
+    with _profiler.stage('Update data store', rows_in=len(dataframe_awt)):
+        update_store(DEFAULT_STORE_DIR, participant, dataframe_awt, tolerance=tolerance, title_rules=_title_rules)
+    with _profiler.stage('Read day features from store') as stage:
+        dataframe_days = read_table(DEFAULT_STORE_DIR, participant, 'days')
+        stage['rows_out'] = len(dataframe_days)
+    return dataframe_days
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, show_spinner='Processing survey results...')
+def process_survey_file(file_hash, _file_bytes, _profiler):
+    with _profiler.stage('Parse survey results') as stage:
+        dataframe_survey = load_survey_data(_file_bytes)
+        stage['rows_out'] = len(dataframe_survey)
+    return dataframe_survey
+
+
+# In server mode all sessions share one pool of worker processes and one store of results
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+
+@st.cache_resource
+def get_session_store():
+    return SessionStore()
+
+
+def get_session_id():
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    return st.session_state.session_id
+
+
+def run_on_server(key, label, function, *args, **kwargs):
+    # Run function in the shared pool and wait for it; key identifies the job within the session
+    job_queue = get_job_queue()
+    job_key = (get_session_id(),) + key
+    job = job_queue.submit(job_key, function, *args, **kwargs)
+
+    # Report the place in the queue while waiting, and the processing time once started
+    started = None
+    with st.status('Waiting for a free worker...') as status:
+        while not job.done():
+            position = job_queue.position(job_key)
+            if position:
+                status.update(label=f'Waiting for {position} other job(s) to finish...')
+            else:
+                started = started or time.monotonic()
+                status.update(label=f'{label} ({time.monotonic() - started:.0f} s)...')
+            time.sleep(0.5)
+        job_queue.forget(job_key)
+        result = job.result()
+        status.update(label=f'{label}: done', state='complete')
+    return result
+
+
+def process_awt_file_on_server(file_hash, files, tolerance, title_rules, low_memory, participant):
+    # Only the day features are kept for this session, and only while it is in use
+    session_store = get_session_store()
+    session_store.evict_idle()
+    session_id = get_session_id()
+
+    key = (file_hash, tolerance, title_rules.digest, low_memory, participant)
+    dataframe_days = session_store.get(session_id, key)
+    if dataframe_days is None:
+        dataframe_days = run_on_server(
+            key, 'Processing AWT data', process_awt_days, files,
+            tolerance=tolerance, low_memory=low_memory, participant=participant, title_rules=title_rules
+        )
+        session_store.put(session_id, key, dataframe_days)
+    return dataframe_days
 
-        # Convert 'Title' column to string
-        dataframe_awt['Title'] = dataframe_awt['Title'].astype(str)
 
-        # Iterate over the DataFrame to merge consecutive rows
-        current_row = None
-        for index, row in dataframe_awt.iterrows():
-            if current_row is None:
-                current_row = row
-            else:
-                # Check if the current row is consecutive with the previous row
-                if row['Begin'] == current_row['End']:
-                    # Merge titles and update End time
-                    current_row['App'] += '; ' + row['App']
-                    current_row['Title'] += '; ' + row['Title']
-                    current_row['End'] = row['End']
-                else:
-                    # Append the current merged row to the list
-                    merged_rows.append(current_row)
-                    # Start a new merged row
-                    current_row = row
-
-        # Append the last merged row
-        if current_row is not None:
-            merged_rows.append(current_row)
-
-        # Create a new DataFrame with the merged rows
-        dataframe_merged_awt = pd.DataFrame(merged_rows)
-
-        # Filter out rows with unwanted titles
-        dataframe_merged_awt = dataframe_merged_awt[~dataframe_merged_awt['Title'].isin(['NO_TITLE', 'Windows Default Lock Screen'])]
-
-        # Reset the index of the new DataFrame
-        dataframe_merged_awt.reset_index(drop=True, inplace=True)
-
-        # Define a custom function to find the most occurring title in a semicolon-separated string
-        def find_most_occurring_title(merged_titles):
-            titles = merged_titles.split(';')
-            title_counts = pd.Series(titles).value_counts()
-            most_occuring_title = title_counts.idxmax()
-            return most_occuring_title
-
-        # Apply the custom function to each row in the DataFrame and create a new column
-        dataframe_merged_awt['Most_occuring_title'] = dataframe_merged_awt['Title'].apply(find_most_occurring_title)
-
-        #st.write("AWT data merged to continued work slots:")
-        #st.write(dataframe_merged_awt.head())
+# Main section for processing AWT data
+if awt_uploaded_files:
+    awt_files_hash = hash_files(awt_uploaded_files)
+    awt_files = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in awt_uploaded_files]
+    try:
+        if SERVER_MODE:
+            dataframe_days = process_awt_file_on_server(
+                awt_files_hash, awt_files, slot_merge_tolerance, title_rules,
+                low_memory_mode, participant_id
+            )
+        elif low_memory_mode:
+            dataframe_days = process_awt_file_in_chunks(
+                awt_files_hash, awt_files, slot_merge_tolerance, title_rules.digest, title_rules, profiler
+            )
+        elif participant_id:
+            dataframe_days = process_awt_file_with_store(
+                awt_files_hash, awt_files, slot_merge_tolerance, title_rules.digest, title_rules, participant_id, profiler
+            )
+        else:
+            dataframe_days = process_awt_file(
+                awt_files_hash, awt_files, slot_merge_tolerance, title_rules.digest, title_rules, profiler
+            )
 
     except pd.errors.ParserError as e:
         st.error(f"Error parsing AWT CSV file: {e}")
@@ -132,27 +306,14 @@ if awt_uploaded_file is not None:
 # Check if a Survey results file has been uploaded
 if survey_uploaded_file is not None:
     try:
-        # Read the uploaded CSV file into a dataframe
-        survey_stringio = StringIO(survey_uploaded_file.getvalue().decode('utf-8'))
-        dialect = csv.Sniffer().sniff(survey_stringio.read(1024))
-        survey_stringio.seek(0)
-        dataframe_survey = pd.read_csv(survey_stringio, delimiter=dialect.delimiter)
-
-        # Display the first 5 rows of the dataframe
-        # st.write("Snippet of the survey results data:")
-        # st.write(dataframe_survey.head())
-
-        # Convert survey date format to match
-        dataframe_survey['Date'] = pd.to_datetime(dataframe_survey['Date'], format='%d-%m-%Y').dt.strftime('%Y-%m-%d')
-
-        #dataframe_survey
+        dataframe_survey = process_survey_file(hash_file(survey_uploaded_file), survey_uploaded_file.getvalue(), profiler)
 
     except pd.errors.ParserError as e:
         st.error(f"Error parsing Survey CSV file: {e}")
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
 
-if survey_uploaded_file is not None and awt_uploaded_file is not None:
+if survey_uploaded_file is not None and awt_uploaded_files:
     st.subheader('Introduction')
     
     st.markdown(
@@ -166,16 +327,24 @@ if survey_uploaded_file is not None and awt_uploaded_file is not None:
     """
     )
 
-    # Ensure Begin and End are datetime columns
-    dataframe_awt['Begin'] = pd.to_datetime(dataframe_awt['Begin'], format='%Y-%m-%d %H:%M:%S')
-    dataframe_awt['End'] = pd.to_datetime(dataframe_awt['End'], format='%Y-%m-%d %H:%M:%S')
-
-    # Calculate the duration (End - Begin) in seconds
-    dataframe_awt['Duration'] = (dataframe_awt['End'] - dataframe_awt['Begin']).dt.total_seconds()
-
-    with st.popover('Change Standard Apps'):
-        # Group by 'App' and sum the durations for each app
-        app_time_spent = dataframe_awt.groupby('App')['Duration'].sum()
+    # The steps below are only computed again when one of their inputs changed, so choosing
+    # another standard browser or PDF tool only recomputes the correlation matrix. In server
+    # mode their results count towards the session's memory limit and are dropped when it is idle
+    if SERVER_MODE:
+        pipeline = Pipeline(SessionCache(get_session_store(), get_session_id()))
+    else:
+        pipeline = Pipeline(st.session_state.setdefault('pipeline_cache', {}))
+    pipeline.input('dataframe_days', dataframe_days, key=(awt_files_hash, slot_merge_tolerance, title_rules.digest, low_memory_mode, participant_id))
+    pipeline.input('dataframe_survey', dataframe_survey, key=hash_file(survey_uploaded_file))
+    pipeline.input('max_apps', max_apps)
+    pipeline.input('correlation_method', correlation_method.lower())
+    pipeline.input('significance_test', significance_test.lower())
+
+    @pipeline.stage('top_apps', inputs=['dataframe_days'])
+    def find_top_apps(dataframe_days):
+        # Sum the durations for each app over all days
+        app_time_spent = dataframe_days.filter(regex='^Time in ').sum()
+        app_time_spent.index = app_time_spent.index.str.removeprefix('Time in ')
 
         # Get the top 10 apps with the most time spent
         top_10_time_spent_apps = app_time_spent.nlargest(10)
@@ -184,16 +353,99 @@ if survey_uploaded_file is not None and awt_uploaded_file is not None:
         top_10_time_spent_apps_readable = top_10_time_spent_apps / 3600  # Converts seconds to hours
 
         # Create a DataFrame for the top 10 apps for editing
-        top_10_df = pd.DataFrame({
+        return pd.DataFrame({
             'App': top_10_time_spent_apps_readable.index,
             'Time Spent (hours)': top_10_time_spent_apps_readable.values,
             'Is Standard Browser': [False] * len(top_10_time_spent_apps_readable),  # Add columns for user input
             'Is Standard PDF Tool': [False] * len(top_10_time_spent_apps_readable)   # Add columns for user input
         })
 
+    @pipeline.stage('dataframe_days_limited', inputs=['dataframe_days', 'max_apps'])
+    def limit_apps(dataframe_days, max_apps):
+        # Limit the per-app columns to the most used apps, keeping the ones the analysis refers to.
+        # The standard apps are among the top 10 apps, so they are always kept as well
+        with profiler.stage('Limit app columns', rows_in=len(dataframe_days)) as stage:
+            dataframe_days_limited = limit_app_columns(dataframe_days, max_apps, keep=REFERENCED_APPS)
+            stage['rows_out'] = len(dataframe_days_limited)
+        return dataframe_days_limited
+
+    @pipeline.stage('merged_dataframe', inputs=['dataframe_days_limited', 'dataframe_survey'])
+    def join_survey(dataframe_days_limited, dataframe_survey):
+        # Join the survey scores to the days on which the survey was filled in
+        return merge_survey(dataframe_days_limited, dataframe_survey)
+
+    @pipeline.stage('productivity_results', inputs=['merged_dataframe', 'correlation_method', 'significance_test'])
+    def correlate(merged_dataframe, correlation_method, significance_test):
+        # Calculate correlation and significance with each target column, one row per variable
+        with profiler.stage('Correlations', rows_in=len(merged_dataframe)) as stage:
+            if SERVER_MODE and significance_test != 't-test':
+                # The resampling tests run as one job in the shared pool instead of a pool of their own
+                productivity_results = run_on_server(
+                    pipeline.key('productivity_results'), 'Testing the significance of the correlations',
+                    correlate_with_survey, merged_dataframe, method=correlation_method, significance=significance_test, workers=1
+                )
+            else:
+                productivity_results = correlate_with_survey(merged_dataframe, method=correlation_method, significance=significance_test)
+            stage['rows_out'] = len(productivity_results)
+        return productivity_results
+
+    @pipeline.stage('scientist_types', inputs=['productivity_results'])
+    def evaluate_scientist_types(productivity_results):
+        # Evaluate the rules of all scientist types at once
+        with profiler.stage('Scientist type rules', rows_in=len(productivity_results)) as stage:
+            evaluated_rules = evaluate_rules(productivity_results)
+            scientist_type_scores = score_scientist_types(productivity_results)
+            stage['rows_out'] = len(evaluated_rules)
+        return evaluated_rules, scientist_type_scores
+
+    @pipeline.stage('correlation_matrix', inputs=['merged_dataframe', 'standard_browser', 'standard_pdf_tool'])
+    def build_correlation_matrix(merged_dataframe, standard_browser, standard_pdf_tool):
+        # Step 1: Define the columns and rows of interest
+        columns_of_interest = ['Absorption', 'Dedication', 'Productivity', 'Vigor']
+        rows_of_interest = [
+            'Start Time (Decimal)', 'End Time (Decimal)', 'Total Time Spent (hours)',
+            'Median Time of Day',
+            'Total Work Slots', 'Average Work Slot Duration',
+            'Share of Work Slots with Most Frequent Title',
+            f'Time in {standard_browser}' if standard_browser else 'Time in Google Chrome',
+            'Time in Microsoft Outlook',
+            f'Time in {standard_pdf_tool}' if standard_pdf_tool else 'Time in Adobe Acrobat',
+            'Time in Microsoft Excel',
+            'Time in Microsoft Word',
+            f'Count of {standard_browser}' if standard_browser else 'Count of Google Chrome',
+            'Count of Microsoft Outlook',
+            f'Count of {standard_pdf_tool}' if standard_pdf_tool else 'Count of Adobe Acrobat',
+            'Count of Microsoft Excel',
+            'Count of Microsoft Word', 'Title_count', 'Unique Titles',
+            'Duration of Longest Title', 'Share of Unique Titles',
+            'Title count per hour on computer', 'Total Breaks',
+            'Average Break Duration', 'Relative break time',
+            'Active Time (hours)', 'Idle Time (hours)', 'Total Focus Blocks',
+            'Focus Time (hours)', 'Interruptions',
+            'Share of Time in Morning', 'Share of Time in Afternoon'
+        ]
+
+        # Step 2: Extract the subset of data
+        subset_data = merged_dataframe[columns_of_interest + rows_of_interest]
+
+        # Step 3: Calculate the correlation matrix
+        with profiler.stage('Correlation matrix', rows_in=len(subset_data)):
+            correlation_matrix = subset_data.corr().loc[rows_of_interest, columns_of_interest]
+        return correlation_matrix, rows_of_interest
+
+    @pipeline.stage('rolling_correlations', inputs=['merged_dataframe', 'rolling_window'])
+    def correlate_over_time(merged_dataframe, rolling_window):
+        # Correlations over a window that slides over the days, and the scientist type scores they give
+        with profiler.stage('Rolling correlations', rows_in=len(merged_dataframe)) as stage:
+            correlations_over_time = rolling_correlations(merged_dataframe, window_days=rolling_window)
+            scores_over_time = score_scientist_types_over_time(correlations_over_time['Productivity'])
+            stage['rows_out'] = len(correlations_over_time)
+        return correlations_over_time, scores_over_time
+
+    with st.popover('Change Standard Apps'):
         # Use st.data_editor to allow the user to specify their standard browser and PDF tool
         edited_df = st.data_editor(
-            top_10_df,
+            pipeline.get('top_apps'),
             num_rows="dynamic",  # Allows adding/removing rows
             use_container_width=True
         )
@@ -206,645 +458,48 @@ if survey_uploaded_file is not None and awt_uploaded_file is not None:
         standard_browser = standard_browser_series.iloc[0] if not standard_browser_series.empty else ''
         standard_pdf_tool = standard_pdf_tool_series.iloc[0] if not standard_pdf_tool_series.empty else ''
 
-    # Extract the date from the Begin column
-    dataframe_awt['Date'] = dataframe_awt['Begin'].dt.date
-
-    # Calculate total time spent on the computer for each day
-    dataframe_days = dataframe_awt.groupby('Date')['Duration'].sum().reset_index()
-
-    # Convert duration from seconds to hours (optional)
-    dataframe_days['Total Time Spent (hours)'] = dataframe_days['Duration'] / 3600
-
-    # Calculate the start time (earliest Begin time) for each day
-    start_times = dataframe_awt.groupby('Date')['Begin'].min().reset_index()
-    start_times.rename(columns={'Begin': 'Start Time'}, inplace=True)
-
-    # Calculate the end time (latest End time) for each day
-    end_times = dataframe_awt.groupby('Date')['End'].max().reset_index()
-    end_times.rename(columns={'End': 'End Time'}, inplace=True)
-
-    # Merge the start times and end times with the dataframe_days
-    dataframe_days = dataframe_days.merge(start_times, on='Date')
-    dataframe_days = dataframe_days.merge(end_times, on='Date')
-
-    # Function to convert time to decimal hours
-    def time_to_decimal(time):
-        if pd.isna(time):
-            return None
-        hours = time.hour
-        minutes = time.minute
-        seconds = time.second
-        decimal_hours = hours + (minutes / 60) + (seconds / 3600)
-        return decimal_hours
-
-    # Apply the conversion function to 'Start Time' and 'End Time'
-    dataframe_days['Start Time (Decimal)'] = dataframe_days['Start Time'].apply(time_to_decimal)
-    dataframe_days['End Time (Decimal)'] = dataframe_days['End Time'].apply(time_to_decimal)
-
-    # Calculate the number and share of unique titles for each day
-    # (1) Count how many times each date occurs in dataframe_awt
-    date_counts = dataframe_awt.groupby('Date').size().reset_index(name='Title_count')
-
-    # (2) Count unique titles for each day
-    unique_titles_count = dataframe_awt.groupby('Date')['Title'].nunique().reset_index(name='Unique Titles')
-
-    # (3) Calculate the share of unique titles across the total number of titles
-    # Calculate the total number of titles (same as the number of occurrences for each date in this context)
-    share_unique_titles = unique_titles_count.copy()
-    share_unique_titles['Share of Unique Titles'] = share_unique_titles['Unique Titles'] / date_counts['Title_count']
-
-    # Merge the calculated columns with dataframe_days
-    dataframe_days = dataframe_days.merge(date_counts, on='Date', how='left')
-    dataframe_days = dataframe_days.merge(unique_titles_count, on='Date', how='left')
-    dataframe_days = dataframe_days.merge(share_unique_titles[['Date', 'Share of Unique Titles']], on='Date', how='left')
-
-    dataframe_days['Title count per hour on computer'] = dataframe_days['Title_count'] / dataframe_days['Total Time Spent (hours)']
-
-    # Check the most occurring titles
-    # Step 1: Calculate the most occurring title for each day
-    title_counts = dataframe_awt.groupby(['Date', 'Title']).size().reset_index(name='Count')
-
-    # Step 2: Identify the most occurring title for each day
-    most_frequent_title = title_counts.loc[title_counts.groupby('Date')['Count'].idxmax()]
-    most_frequent_title = most_frequent_title[['Date', 'Title']]
-    most_frequent_title.rename(columns={'Title': 'Most Frequent Title'}, inplace=True)
-
-    # Step 3: Merge the most frequent title with the dataframe_days
-    dataframe_days = dataframe_days.merge(most_frequent_title, on='Date')
-
-    # Step 1: Calculate the total time spent on each title for each day
-    title_duration = dataframe_awt.groupby(['Date', 'Title'])['Duration'].sum().reset_index()
-
-    # Step 2: Identify the title with the longest duration for each day
-    max_duration_info = title_duration.loc[title_duration.groupby('Date')['Duration'].idxmax()]
-    max_duration_info = max_duration_info[['Date', 'Title', 'Duration']]
-    max_duration_info.rename(columns={'Title': 'Title with Longest Duration', 'Duration': 'Duration of Longest Title'}, inplace=True)
-
-    # Step 3: Merge the title with the longest duration with the dataframe_days
-    dataframe_days = dataframe_days.merge(max_duration_info, on='Date')
-
-    # Extract the date from the Begin column
-    dataframe_awt['Date'] = dataframe_awt['Begin'].dt.date
+    pipeline.input('standard_browser', standard_browser)
+    pipeline.input('standard_pdf_tool', standard_pdf_tool)
 
-    # Step 1: Pivot the data to get total duration spent in each App for each day
-    pivot_table_duration = dataframe_awt.pivot_table(index='Date', columns='App', values='Duration', aggfunc='sum', fill_value=0)
-
-    # Add prefix to each of the app duration columns
-    pivot_table_duration = pivot_table_duration.add_prefix('Time in ')
-
-    # Step 2: Pivot the data to get the count of occurrences for each App for each day
-    pivot_table_count = dataframe_awt.pivot_table(index='Date', columns='App', values='Duration', aggfunc='count', fill_value=0)
-
-    # Add prefix to each of the app count columns
-    pivot_table_count = pivot_table_count.add_prefix('Count of ')
-
-    # Step 3: Merge both pivot tables with dataframe_days
-    pivot_table_duration = pivot_table_duration.reset_index()
-    pivot_table_count = pivot_table_count.reset_index()
-
-    dataframe_days = dataframe_days.merge(pivot_table_duration, on='Date', how='left')
-    dataframe_days = dataframe_days.merge(pivot_table_count, on='Date', how='left')
-
-    # Ensure that Begin and End are datetime columns in dataframe_merged_awt
-    dataframe_merged_awt['Begin'] = pd.to_datetime(dataframe_merged_awt['Begin'], format='%Y-%m-%d %H:%M:%S')
-    dataframe_merged_awt['End'] = pd.to_datetime(dataframe_merged_awt['End'], format='%Y-%m-%d %H:%M:%S')
-
-    # Calculate the duration (End - Begin) in seconds
-    dataframe_merged_awt['Duration'] = (dataframe_merged_awt['End'] - dataframe_merged_awt['Begin']).dt.total_seconds()
-
-    # Extract the date from the Begin column
-    dataframe_merged_awt['Date'] = dataframe_merged_awt['Begin'].dt.date
-
-    # Step 1: Calculate the midpoint of each work slot
-    dataframe_merged_awt['Midpoint'] = dataframe_merged_awt['Begin'] + (dataframe_merged_awt['End'] - dataframe_merged_awt['Begin']) / 2
-
-    # Step 2: Convert the midpoint to a decimal representation of the time of day (hours since midnight)
-    dataframe_merged_awt['Midpoint_Hours'] = dataframe_merged_awt['Midpoint'].dt.hour + dataframe_merged_awt['Midpoint'].dt.minute / 60
-
-    # Step 3: Calculate the median of these midpoints for each day
-    median_time_of_day = dataframe_merged_awt.groupby('Date')['Midpoint_Hours'].median().reset_index(name='Median Time of Day')
-
-    # Step 4: Merge this metric into the existing dataframe_days
-    dataframe_days = dataframe_days.merge(median_time_of_day, on='Date', how='left')
-
-    # Calculate total number of work slots per day
-    work_slots_count = dataframe_merged_awt.groupby('Date').size().reset_index(name='Total Work Slots')
-
-    # Calculate average duration of work slots per day
-    average_duration = dataframe_merged_awt.groupby('Date')['Duration'].mean().reset_index(name='Average Work Slot Duration')
-
-    # Merge these calculations with the existing dataframe_days
-    dataframe_days = dataframe_days.merge(work_slots_count, on='Date', how='left')
-    dataframe_days = dataframe_days.merge(average_duration, on='Date', how='left')
-
-    # Sort dataframe by Date and Begin time
-    dataframe_merged_awt = dataframe_merged_awt.sort_values(by=['Date', 'Begin'])
-
-    # Calculate the end time of the previous work slot for each row
-    dataframe_merged_awt['Previous End'] = dataframe_merged_awt.groupby('Date')['End'].shift(1)
-
-    # Calculate the break duration (in seconds) as the difference between the current slot's start and the previous slot's end
-    dataframe_merged_awt['Break Duration'] = (dataframe_merged_awt['Begin'] - dataframe_merged_awt['Previous End']).dt.total_seconds()
-
-    # Consider only positive break durations (where there actually is a break)
-    valid_breaks = dataframe_merged_awt[dataframe_merged_awt['Break Duration'] > 0]
-
-    # Calculate the number of breaks per day
-    breaks_count = valid_breaks.groupby('Date').size().reset_index(name='Total Breaks')
-
-    # Calculate the average duration of breaks per day
-    average_break_duration = valid_breaks.groupby('Date')['Break Duration'].mean().reset_index(name='Average Break Duration')
-
-    # Merge these break calculations with the existing dataframe_days
-    dataframe_days = dataframe_days.merge(breaks_count, on='Date', how='left')
-    dataframe_days = dataframe_days.merge(average_break_duration, on='Date', how='left')
-
-    dataframe_days['Relative break time'] = dataframe_days['Average Break Duration'] / (dataframe_days['Duration'])
-
-    # Count occurrences of each title for each day
-    title_counts = dataframe_merged_awt.groupby(['Date', 'Most_occuring_title']).size().reset_index(name='Title Count')
-
-    # Find the most frequent title for each day
-    most_frequent_title = title_counts.loc[title_counts.groupby('Date')['Title Count'].idxmax()]
-
-    # Merge the most frequent title information with work slots count
-    most_frequent_title = most_frequent_title.rename(columns={'Most_occuring_title': 'Most Frequent Title'})
-    most_frequent_title = most_frequent_title[['Date', 'Most Frequent Title', 'Title Count']]
-
-    # Merge to get title counts with total work slots
-    merged_slots = work_slots_count.merge(most_frequent_title, on='Date', how='left')
-
-    # Calculate the share of work slots with the most frequent title
-    merged_slots['Share of Work Slots with Most Frequent Title'] = (
-        merged_slots['Title Count'] / merged_slots['Total Work Slots']
-    )
-
-    # Merge these calculations with the existing dataframe_days
-    dataframe_days = dataframe_days.merge(work_slots_count, on='Date', how='left')
-    dataframe_days = dataframe_days.merge(average_duration, on='Date', how='left')
-    dataframe_days = dataframe_days.merge(merged_slots[['Date', 'Share of Work Slots with Most Frequent Title']], on='Date', how='left')
-
-    dataframe_days['Date'] = pd.to_datetime(dataframe_days['Date'], format='%d-%m-%Y').dt.strftime('%Y-%m-%d')
-
-    # Merge the dataframes on the 'Date' column
-    merged_dataframe = dataframe_days.merge(dataframe_survey, on='Date', how='left')
-
-    # Drop days where no survey was filled in
-    merged_dataframe = merged_dataframe.dropna(subset=['Productivity'])
-
-    # Automatically select only numeric columns
-    numeric_columns = merged_dataframe.select_dtypes(include='number').columns
-
-    # Generalized function to calculate Pearson correlation, t-statistic, and significance
-    def calculate_significance(data, numeric_columns, target_columns):
-        results = []
-        n = len(data)  # Sample size
-        
-        for target in target_columns:
-            for col in numeric_columns:
-                if col != target:
-                    # Calculate Pearson correlation between the target variable and the other column
-                    r = data[target].corr(data[col])
-                    
-                    # Calculate t-statistic
-                    if abs(r) < 1.0:
-                        t_stat = r * np.sqrt((n - 2) / (1 - r**2))
-                    else:
-                        t_stat = float('inf')  # Handle perfect correlations
-                    
-                    # Approximate p-value significance
-                    significance = 'High' if abs(t_stat) > 2 else 'Low'
-                    
-                    results.append({
-                        'Variable': col,
-                        f'Correlation with {target}': r,
-                        f'T-Statistic with {target}': t_stat,
-                        f'Significance with {target}': significance
-                    })
-        
-        return pd.DataFrame(results)
-
-    # Specify the target columns
-    target_columns = ['Productivity', 'Absorption', 'Vigor', 'Dedication']
-
-    # Calculate correlation and significance with each target column
-    productivity_results = calculate_significance(merged_dataframe, numeric_columns, target_columns)
-
-    # Merge results into one dataframe
-    productivity_results = productivity_results.groupby('Variable', as_index=False).first()
+    merged_dataframe = pipeline.get('merged_dataframe')
+    productivity_results = pipeline.get('productivity_results')
 
     st.write('Let\'s see how your scores correlate with your AWT data. We\'ll first explore the 6 productivity types below and see the extent to which you align with each of them.')
 
     st.divider()
 
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["🐶 Social scientist", "🐺 Lone scientist", 
-                                                  "🐱 Focused scientist", "🐨 Balanced scientist", "🐯 Leading scientist", 
-                                                  "🐘 Goal-oriented scientist"])
-    data = np.random.randn(10, 1)
-
-    with tab1:
-        st.subheader("Description")
-        st.write("*Feels productive when helping coworkers, collaborating and doing code reviews [providing feedback]. To get things done, they come early to work or work late and try to focus on a single task*")
-
-        st.subheader("Scores")
-        # Variables to check
-        variables_to_check = [
-            'Time in Microsoft Teams',
-            'Start Time (Decimal)',
-            'End Time (Decimal)',
-            'Share of Unique Titles',
-            'Total Time Spent (hours)',
-            'Time in Microsoft Word',
-            'Duration of Longest Title'
-        ]
+    evaluated_rules, scientist_type_scores = pipeline.get('scientist_types')
 
-        # Filter the dataframe for the selected variables
-        filtered_data = productivity_results[productivity_results['Variable'].isin(variables_to_check)]
-
-        # Display results for each variable
-        for _, row in filtered_data.iterrows():
-            variable = row['Variable']
-            correlation_value = row['Correlation with Productivity']
-
-            if variable == 'Time in Microsoft Teams':
-                # Display correlation with productivity
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **More time spent in Teams (helping coworkers, collaborating) feels more productive**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **More time spent in Teams (helping coworkers, collaborating) feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Start Time (Decimal)':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Starting earlier feels more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Starting earlier feels more productive**: {correlation_value:f} ')
-
-            elif variable == 'End Time (Decimal)':
-                # Check the value and display results
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **Ending later feels more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Ending later feels more productive**: {correlation_value:f} ')
-
-            #elif variable == 'Share of Unique Titles':
-                # Check the value and display results
-            #    if correlation_value < -0.1:
-            #        st.markdown(f'✅ **Less variety in tasks feels more productive**: {correlation_value:f} ')
-            #    else:
-            #        st.markdown(f'❌ **Less variety in tasks feels more productive**: {correlation_value:f}')
-
-            #elif variable == 'Total Time Spent (hours)':
-                # Check the value and display results
-            #    if correlation_value > 0.1:
-            #        st.markdown(f'✅ **More time spent on computer feels more productive**: {correlation_value:f} ')
-            #    else:
-            #        st.markdown(f'❌ **More time spent on computer feels more productive**: {correlation_value:f}')
-
-            #elif variable == 'Time in Microsoft Word':
-                # Check the value and display results
-            #    if correlation_value > 0.1:
-            #        st.markdown(f'✅ **More time spent in Word feels more productive**: {correlation_value:f} ')
-            #    else:
-            #        st.markdown(f'❌ **More time spent in Word feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Duration of Longest Title':
-                # Check the value and display results
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **Spending a long time on one task feels more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Spending a long time on one task feels more productive**: {correlation_value:f}')
-
-
-        if filtered_data.empty:
-            st.write('No data available for the selected variables.')
-
-        st.subheader("Job crafting")
-        st.write("If you tick a lot of boxes here, you might consider seeking more interactions, e.g., by going to the office to work, or scheduling office hours for your daily chats.")
-
-    with tab2: 
-        st.subheader("Description")
-        st.write("*Avoids disruptions such as noise, email, meetings, and code reviews [feedback sessions]. They feel most productive when they have little to no social interactions and when they can work on solving problems, fixing bugs or coding features [writing] in quiet and without interruptions. To reflect about work, they are mostly interested in knowing the frequency and duration of interruptions they encountered.*")
-
-        st.subheader("Scores")
-        # Variables to check
-        variables_to_check = [
-            'Count of Microsoft Teams',
-            'Count of Microsoft Outlook',
-            'Average Work Slot Duration_x',
-            'Total Time Spent (hours)',
-            'Time in Microsoft Word',
-            'Average Break Duration',
-            'Total Breaks'
-        ]
+    tabs = st.tabs([f'{SCIENTIST_TYPE_TEXTS[name][0]} {name}' for name in SCIENTIST_TYPES])
 
-        # Filter the dataframe for the selected variables
-        filtered_data = productivity_results[productivity_results['Variable'].isin(variables_to_check)]
-
-        # Display results for each variable
-        for _, row in filtered_data.iterrows():
-            variable = row['Variable']
-            correlation_value = row['Correlation with Productivity']
-
-            if variable == 'Count of Microsoft Teams':
-                # Display correlation with productivity
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Less times opening Teams feels more productive**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **Less times opening Teams feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Count of Microsoft Outlook':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Less times opening Outlook feels more productive**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **Less times opening Outlook feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Average Work Slot Duration_x':
-                # Check the value and display results
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **Longer work slots feel more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Longer work slots feel more productive**: {correlation_value:f}')
-
-            elif variable == 'Total Time Spent (hours)':
-                # Check the value and display results
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **More time spent on computer feels more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **More time spent on computer feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Average Break Duration':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Longer breaks feel less productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Longer breaks feel less productive**: {correlation_value:f}')
-
-            elif variable == 'Total Breaks':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **More breaks feel less productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **More breaks feel less productive**: {correlation_value:f}')
-
-        if filtered_data.empty:
-            st.write('No data available for the selected variables.')
-
-        st.subheader("Job crafting")
-        st.write("If you tick a lot of boxes here, you might consider tuning down possible interruptions, i.e., by blocking messages and finding quiet working spaces.")
-
-    with tab3: 
-        st.subheader("Description")
-        st.write("*Feels most productive when they are working efficiently and concentrated on a single task at a time. They are feeling unproductive when they are wasting time and spend too much time on a task, because they are stuck or working slowly. They are interested in knowing the number of interruptions and focused time.*")
-    
-        st.subheader("Scores")
-        # Variables to check
-        variables_to_check = [
-            'Share of Work Slots with Most Frequent Title',
-            'Title count per hour on computer',
-            'Average Work Slot Duration_x',
-            'Duration of Longest Title',
-            'Total Breaks'
-        ]
+    for tab, scientist_type in zip(tabs, SCIENTIST_TYPES):
+        icon, description, job_crafting = SCIENTIST_TYPE_TEXTS[scientist_type]
+        with tab:
+            st.subheader("Description")
+            st.write(description)
 
-        # Filter the dataframe for the selected variables
-        filtered_data = productivity_results[productivity_results['Variable'].isin(variables_to_check)]
-
-        # Display results for each variable
-        for _, row in filtered_data.iterrows():
-            variable = row['Variable']
-            correlation_value = row['Correlation with Productivity']
-
-            if variable == 'Share of Work Slots with Most Frequent Title':
-                # Display correlation with productivity
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **More work slots spent on the same task feels unproductive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **More work slots spent on the same task feels unproductive**: {correlation_value:f} ')
-
-            elif variable == 'Title count per hour on computer':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Less switching between tasks feels more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Less switching between tasks feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Average Work Slot Duration_x':
-                # Check the value and display results
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **Longer work slots feel more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Longer work slots feel more productive**: {correlation_value:f}')
-
-            elif variable == 'Duration of Longest Title':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Long work on a single task feels unproductive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Long work on a single task feels unproductive**: {correlation_value:f}')
-
-            elif variable == 'Total Breaks':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **More breaks feel less productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **More breaks feel less productive**: {correlation_value:f}')
-        
-        if filtered_data.empty:
-            st.write('No data available for the selected variables.')
-
-        st.subheader("Job crafting")
-        st.write("If you tick a lot of boxes here, you might consider blocking time for particular tasks, which you have to finish before moving on to the next. Finding a quiet office space might help.")
-        
-    with tab4: 
-        st.subheader("Description")
-        st.write("*Is less affected by disruptions. They are less likely to come early to work or work late. They are feeling unproductive, when tasks are unclear or irrelevant, they are unfamiliar with a task, or when tasks are causing overhead.*")
-
-        st.subheader("Scores")
-        # Variables to check
-        variables_to_check = [
-            'Start Time (Decimal)',
-            'Total Breaks',
-            'End Time (Decimal)',
-            'Average Work Slot Duration_x',
-            'Time in Microsoft Teams',
-            'Time in Microsoft Outlook'
-        ]
+            st.subheader("Scores")
+            type_score = scientist_type_scores.set_index('Scientist Type').loc[scientist_type]
+            if type_score['Checked Rules']:
+                st.caption(f"{type_score['Matched Rules']} of {type_score['Checked Rules']} statements apply to you.")
 
-        # Filter the dataframe for the selected variables
-        filtered_data = productivity_results[productivity_results['Variable'].isin(variables_to_check)]
-
-        # Display results for each variable
-        for _, row in filtered_data.iterrows():
-            variable = row['Variable']
-            correlation_value = row['Correlation with Productivity']
-
-            if variable == 'Start Time (Decimal)': 
-                # Check the value and display results
-                if correlation_value > -0.1:
-                    st.markdown(f'✅ **Starting earlier does not increase the feeling of productivity**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **Starting earlier does not increase the feeling of productivity**: {correlation_value:f}')
-
-            elif variable == 'Total Breaks':
-                # Check the value and display results
-                if correlation_value > -0.1:
-                    st.markdown(f'✅ **More breaks do not decrease the feeling of productivity**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **More breaks do not decrease the feeling of productivity**: {correlation_value:f}')
-
-            elif variable == 'End Time (Decimal)':
-                # Check the value and display results
-                if correlation_value < 0.1:
-                    st.markdown(f'✅ **Ending later does not increase the feeling of productivity**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **Ending later does not increase the feeling of productivity**: {correlation_value:f}')
-
-            #elif variable == 'Average Work Slot Duration_x':
-                # Check the value and display results
-            #    if correlation_value < 0.1:
-            #        st.markdown(f'✅ **Length of work slots does not affect the feeling of productivity**: {correlation_value:f} ')
-            #    else:
-            #        st.markdown(f'❌ **Length of work slots does not affect the feeling of productivity**: {correlation_value:f} ')
-
-            elif variable == 'Time in Microsoft Outlook':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Less time spent in Outlook feels more productive**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **Less time spent in Outlook feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Time in Microsoft Teams':
-                # Check the value and display results
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Less time spent in Teams feels more productive**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **Less time spent in Teams feels more productive**: {correlation_value:f}')
-
-        if filtered_data.empty:
-            st.write('No data available for the selected variables.')
-
-        st.subheader("Job crafting")
-        st.write("If you tick a lot of boxes here, you might consider varying your daily tasks and taking sufficient breaks to avoid boredom and tiredness.")
-
-    with tab5: 
-        st.subheader("Description")
-        st.write("*Is more comfortable with meetings and emails and feel less productive with coding [writing] activities than other developers [scientists]. They feel more productive in the afternoon and when they can write and design things. They don’t like broken builds and blocking tasks [?], preventing them (or the team) from doing productive work.*")
-
-        st.subheader("Scores")
-        # Variables to check
-        variables_to_check = [
-            'Time in Microsoft Teams',
-            'Time in Microsoft Outlook',
-            'Average Work Slot Duration_x',
-            'Total Time Spent (hours)',
-            'Median Time of Day'
-        ]
+            # Display the result of each rule of this scientist type
+            type_rules = evaluated_rules[evaluated_rules['scientist_type'] == scientist_type]
+            for rule in type_rules.itertuples():
+                mark = '✅' if rule.Matched else '❌'
+                st.markdown(f'{mark} **{rule.message}**: {rule.Correlation:f}')
 
-        # Filter the dataframe for the selected variables
-        filtered_data = productivity_results[productivity_results['Variable'].isin(variables_to_check)]
-
-        # Display results for each variable
-        for _, row in filtered_data.iterrows():
-            variable = row['Variable']
-            correlation_value = row['Correlation with Productivity']
-
-            if variable == 'Time in Microsoft Teams':
-                # Display correlation with productivity
-                if correlation_value > -0.1:
-                    st.markdown(f'✅ **More time spent in Teams does not decrease the feeling of productivity**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **More time spent in Teams does not decrease the feeling of productivity**: {correlation_value:f}')
-
-            elif variable == 'Time in Microsoft Outlook':
-                # Check the value and display results
-                if correlation_value > -0.1:
-                    st.markdown(f'✅ **More time spent in Outlook does not decrease the feeling of productivity**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **More time spent in Outlook does not decrease the feeling of productivity**: {correlation_value:f}')
-
-            #elif variable == 'Average Work Slot Duration_x':
-                # Check the value and display results
-            #    if correlation_value < -0.1:
-            #        st.markdown(f'✅ **Shorter work slots do not affect the feeling of productivity**: {correlation_value:f}')
-            #    else:
-            #        st.markdown(f'❌ **Shorter work slots do not affect the feeling of productivity**: {correlation_value:f}')
-
-            #elif variable == 'Total Time Spent (hours)':
-                # Check the value and display results
-            #    if correlation_value < -0.1:
-            #        st.markdown(f'✅ **More time spent away from computer feels more productive**: {correlation_value:f} ')
-            #    else:
-            #        st.markdown(f'❌ **More time spent away from computer feels more productive**: {correlation_value:f}')
-
-            elif variable == 'Median Time of Day':
-                # Check the value and display results
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **Working later in the day mostly, feels more productive**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **Working later in the day mostly, feels more productive**: {correlation_value:f}')
-
-        if filtered_data.empty:
-            st.write('No data available for the selected variables.')
-
-        st.subheader("Job crafting")
-        st.write("If you tick a lot of boxes here, you might consider mostly scheduling meetings in the morning, with sufficient time in between, and block time for creation in the afternoons.")
-
-    with tab6: 
-        st.subheader("Description")
-        st.write("*Feels productive when they complete or make progress on tasks. They feel less productive when they multi-task, are goal-less or are stuck. They are more open to meetings and emails compared to the other clusters, in case they help them achieve their goals.*")
-    
-        st.subheader("Scores")
-        # Variables to check
-        variables_to_check = [
-            'Title count per hour on computer',
-            'Average Work Slot Duration_x',
-            'Time in Microsoft Teams',
-            'Time in Microsoft Outlook'
-        ]
+            if type_rules.empty:
+                st.write('No data available for the selected variables.')
 
-        # Filter the dataframe for the selected variables
-        filtered_data = productivity_results[productivity_results['Variable'].isin(variables_to_check)]
-
-        # Display results for each variable
-        for _, row in filtered_data.iterrows():
-            variable = row['Variable']
-            correlation_value = row['Correlation with Productivity']
-
-            if variable == 'Title count per hour on computer':
-                # Display correlation with productivity
-                if correlation_value < -0.1:
-                    st.markdown(f'✅ **Less switching between tasks feels more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Less switching between tasks feels more productive**: {correlation_value:f} ')
-
-            elif variable == 'Time in Microsoft Teams':
-                # Display correlation with productivity
-                if correlation_value > -0.1:
-                    st.markdown(f'✅ **More time spent in Teams (meetings) does not decrease the feeling of productivity**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **More time spent in Teams (meetings) does not decrease the feeling of productivity**: {correlation_value:f}')
-
-            elif variable == 'Time in Microsoft Outlook':
-                # Display correlation with productivity
-                if correlation_value > -0.1:
-                    st.markdown(f'✅ **More time spent in Outlook (emails) does not decrease the feeling of productivity**: {correlation_value:f}')
-                else:
-                    st.markdown(f'❌ **More time spent in Outlook (emails) does not decrease the feeling of productivity**: {correlation_value:f}')
-
-            elif variable == 'Average Work Slot Duration_x':
-                # Check the value and display results
-                if correlation_value > 0.1:
-                    st.markdown(f'✅ **Longer work slots feel more productive**: {correlation_value:f} ')
-                else:
-                    st.markdown(f'❌ **Longer work slots feel more productive**: {correlation_value:f}')
-
-        if filtered_data.empty:
-            st.write('No data available for the selected variables.')
-
-        st.subheader("Job crafting")
-        st.write("If you tick a lot of boxes here, you might consider turning down or re-scheduling meetings without a clear goal, or steering the meeting towards a goal yourself.")
+            # How the work is spread over the day, from the time buckets of the activity
+            if scientist_type == 'Leading scientist':
+                morning_share = dataframe_days['Share of Time in Morning'].mean()
+                afternoon_share = dataframe_days['Share of Time in Afternoon'].mean()
+                st.caption(f'On average, {morning_share:.0%} of your time on the computer was in the morning (6:00-12:00) and {afternoon_share:.0%} in the afternoon (12:00-18:00).')
+
+            st.subheader("Job crafting")
+            st.write(job_crafting)
 
     st.divider()
 
@@ -872,134 +527,248 @@ if survey_uploaded_file is not None and awt_uploaded_file is not None:
             - Longest duration of title: duration of title in which most time was spent 
             - Share of unique titles: unique titles divided by total number of windows
             - Title count per hour on computer: number of titles relative to the total time spent on the computer
+            - Titles are cleaned before they are counted, so e.g. 'Report - Word' and 'Report (autosaved) - Word' are one title (see Change Title Rules)
+            - Time on [Category]: total time of the windows whose title is classified in this activity category, e.g. Meeting, Email or Writing
 
             **Breaks**
-            - Total breaks: count of all breaks between work slots
+            - Total breaks: count of all breaks between work slots; windows that overlap (e.g. on several monitors) do not count as a break
             - Average break duration: average duration of breaks (see total breaks)
             - Relative break time: duration of breaks relative to the total time spent on the computer
+
+            **Activity**
+            - Active time: time in which at least one window was active, counting overlapping windows once
+            - Idle time: total duration of the breaks of the day
+            - Total focus blocks: count of stretches of at least 25 minutes without a break
+            - Focus time: total duration of the focus blocks
+            - Interruptions: count of breaks of at most 5 minutes
+
+            **Time of day**
+            - Share of time in morning: share of the active time of the day between 6:00 and 12:00
+            - Share of time in afternoon: share of the active time of the day between 12:00 and 18:00
             """
             )
 
     with st.expander("Detailed data"):
-        st.write("Data per day")
-        merged_dataframe
-
         st.write("Correlations")
         productivity_results
 
-        # Filter for strong correlations (>= 0.4) and high significance
-        filtered_results = productivity_results[
-            ((productivity_results['Correlation with Productivity'] >= 0.2) | 
-            (productivity_results['Correlation with Productivity'] <= -0.2)) & 
-            (productivity_results['Significance with Productivity'] == 'High')
-        ]
-        # filtered_results
-
-        # Function to create scatterplots for significant correlations
-        def create_scatterplots(data, filtered_results):
-            charts = []
-            
-            for _, row in filtered_results.iterrows():
-                variable = row['Variable']
-                
-                # Create scatterplot
-                scatterplot = alt.Chart(data).mark_point().encode(
-                    x=alt.X('Productivity:Q', title='Productivity'),
-                    y=alt.Y(f'{variable}:Q', title=variable),
-                    tooltip=['Productivity', variable]
-                ).properties(
-                    title=f'Scatterplot of Productivity vs {variable}'
-                )
-                
-                charts.append(scatterplot)
-            
-            return alt.vconcat(*charts)
-
-        # Generate scatterplots
-        scatterplots = create_scatterplots(merged_dataframe, filtered_results)
-
-        # Function to create box plots for significant correlations
-        def create_box_plots(data, filtered_results):
-            charts = []
-            
-            for _, row in filtered_results.iterrows():
-                variable = row['Variable']
-                
-                # Create box plot
-                box_plot = alt.Chart(data).mark_boxplot().encode(
-                    x=alt.X('Productivity:O', title='Productivity'),
-                    y=alt.Y(f'{variable}:Q', title=variable),
-                    tooltip=['Productivity', variable]
-                ).properties(
-                    title=f'Box Plot of {variable} by Productivity'
-                )
-                
-                charts.append(box_plot)
-            
-            return alt.vconcat(*charts)
-
-        # Generate box plots
-        box_plots = create_box_plots(merged_dataframe, filtered_results)
-
-        # Display box plots in Streamlit
-        st.altair_chart(box_plots, use_container_width=True)
-
-        # Step 1: Define the columns and rows of interest
-        columns_of_interest = ['Absorption', 'Dedication', 'Productivity', 'Vigor']
-        rows_of_interest = [
-            'Start Time (Decimal)', 'End Time (Decimal)', 'Total Time Spent (hours)',
-            'Median Time of Day',
-            'Total Work Slots_x', 'Average Work Slot Duration_x',
-            'Share of Work Slots with Most Frequent Title',
-            f'Time in {standard_browser}' if standard_browser else 'Time in Google Chrome',
-            'Time in Microsoft Outlook',
-            f'Time in {standard_pdf_tool}' if standard_pdf_tool else 'Time in Adobe Acrobat',
-            'Time in Microsoft Excel',
-            'Time in Microsoft Word',
-            f'Count of {standard_browser}' if standard_browser else 'Count of Google Chrome',
-            'Count of Microsoft Outlook',
-            f'Count of {standard_pdf_tool}' if standard_pdf_tool else 'Count of Adobe Acrobat',
-            'Count of Microsoft Excel',
-            'Count of Microsoft Word', 'Title_count', 'Unique Titles',
-            'Duration of Longest Title', 'Share of Unique Titles',
-            'Title count per hour on computer', 'Total Breaks',
-            'Average Break Duration', 'Relative break time'
-        ]
-
-
-        # Step 2: Extract the subset of data
-        subset_data = merged_dataframe[columns_of_interest + rows_of_interest]
-
-        # Step 3: Calculate the correlation matrix
-        correlation_matrix = subset_data.corr().loc[rows_of_interest, columns_of_interest]
-
-        correlation_matrix
-
-        # Step 4: Convert the correlation matrix into a long format for Altair
-        correlation_df = correlation_matrix.reset_index().melt(id_vars='index', var_name='Column', value_name='Correlation')
-        correlation_df = correlation_df.rename(columns={'index': 'Row'})
-
-        # Step 5: Create a heatmap using Altair
-        heatmap = alt.Chart(correlation_df).mark_rect().encode(
-            x=alt.X('Column:O', title=''),
-            y=alt.Y('Row:O', title='', sort=rows_of_interest, axis=alt.Axis(labelFontSize=8, labelPadding=5)),
-            color=alt.Color('Correlation:Q', scale=alt.Scale(scheme='redblue', domain=[-1, 1])),
-            tooltip=['Row', 'Column', 'Correlation']
-        ).properties(
-            width=400,
-            height=800,
-            title='Correlation Matrix of Selected Features'
-        )
+        st.write("Scientist type scores")
+        scientist_type_scores
+
+        # The sections below are only computed when they are switched on, and switching them
+        # only reruns this fragment instead of the whole analysis
+        @st.fragment
+        def show_detailed_data():
+            if st.toggle("Show data per day"):
+                merged_dataframe
+
+            if st.toggle("Show plots of strong correlations"):
+                show_correlation_plots()
+
+            if st.toggle("Show correlation matrix"):
+                show_correlation_matrix()
+
+            if st.toggle("Show correlations over time"):
+                show_correlations_over_time()
+
+        def show_correlation_plots():
+            # Filter for strong correlations (>= 0.4) and high significance
+            filtered_results = productivity_results[
+                ((productivity_results['Correlation with Productivity'] >= 0.2) | 
+                (productivity_results['Correlation with Productivity'] <= -0.2)) & 
+                (productivity_results['Significance with Productivity'] == 'High')
+            ]
+            # filtered_results
+            if filtered_results.empty:
+                st.write('No strong and significant correlations with Productivity found.')
+                return
+
+            # Function to create scatterplots for significant correlations
+            def create_scatterplots(data, filtered_results):
+                charts = []
+
+                # All scatterplots share one data set with only the plotted columns
+                points = melt_variables(data, filtered_results['Variable'])
+
+                for _, row in filtered_results.iterrows():
+                    variable = row['Variable']
+
+                    # Create scatterplot
+                    scatterplot = alt.Chart(points).transform_filter(
+                        alt.datum.Variable == variable
+                    ).mark_point().encode(
+                        x=alt.X('Productivity:Q', title='Productivity'),
+                        y=alt.Y('Value:Q', title=variable),
+                        tooltip=['Productivity', alt.Tooltip('Value:Q', title=variable)]
+                    ).properties(
+                        title=f'Scatterplot of Productivity vs {variable}'
+                    )
+
+                    charts.append(scatterplot)
+
+                return alt.vconcat(*charts)
+
+            # Function to create box plots for significant correlations
+            def create_box_plots(data, filtered_results):
+                charts = []
+
+                # The quantiles are calculated here, so only the boxes and the outliers are sent to the browser
+                summary, outliers = box_plot_summary(data, filtered_results['Variable'])
+
+                for _, row in filtered_results.iterrows():
+                    variable = row['Variable']
+
+                    # Create box plot
+                    box = alt.Chart(summary).transform_filter(alt.datum.Variable == variable).encode(
+                        x=alt.X('Productivity:O', title='Productivity')
+                    )
+                    whiskers = box.mark_rule().encode(
+                        y=alt.Y('Lower:Q', title=variable),
+                        y2='Upper:Q'
+                    )
+                    boxes = box.mark_bar(size=14).encode(
+                        y='Q1:Q',
+                        y2='Q3:Q',
+                        tooltip=['Productivity', 'Lower', 'Q1', 'Median', 'Q3', 'Upper']
+                    )
+                    medians = box.mark_tick(color='white', size=14).encode(
+                        y='Median:Q'
+                    )
+                    points = alt.Chart(outliers).transform_filter(alt.datum.Variable == variable).mark_point().encode(
+                        x=alt.X('Productivity:O', title='Productivity'),
+                        y='Value:Q',
+                        tooltip=['Productivity', alt.Tooltip('Value:Q', title=variable)]
+                    )
+                    box_plot = alt.layer(whiskers, boxes, medians, points).properties(
+                        title=f'Box Plot of {variable} by Productivity'
+                    )
+
+                    charts.append(box_plot)
+
+                return alt.vconcat(*charts)
+
+            # Generate box plots
+            with profiler.stage('Box plots', rows_in=len(merged_dataframe)):
+                box_plots = create_box_plots(merged_dataframe, filtered_results)
+
+            # Display box plots in Streamlit
+            st.altair_chart(box_plots, use_container_width=True)
+
+            # Scatterplots are only built when asked for
+            if st.checkbox("Also show scatterplots"):
+                with profiler.stage('Scatterplots', rows_in=len(merged_dataframe)):
+                    scatterplots = create_scatterplots(merged_dataframe, filtered_results)
+                st.altair_chart(scatterplots, use_container_width=True)
+
+        def show_correlation_matrix():
+            correlation_matrix, rows_of_interest = pipeline.get('correlation_matrix')
+
+            correlation_matrix
+
+            # Step 4: Convert the correlation matrix into a long format for Altair
+            correlation_df = correlation_matrix.reset_index().melt(id_vars='index', var_name='Column', value_name='Correlation')
+            correlation_df = correlation_df.rename(columns={'index': 'Row'})
+
+            # Step 5: Create a heatmap using Altair
+            heatmap = alt.Chart(correlation_df).mark_rect().encode(
+                x=alt.X('Column:O', title=''),
+                y=alt.Y('Row:O', title='', sort=rows_of_interest, axis=alt.Axis(labelFontSize=8, labelPadding=5)),
+                color=alt.Color('Correlation:Q', scale=alt.Scale(scheme='redblue', domain=[-1, 1])),
+                tooltip=['Row', 'Column', 'Correlation']
+            ).properties(
+                width=400,
+                height=800,
+                title='Correlation Matrix of Selected Features'
+            )
 
-        # Add text to the heatmap to display correlation values
-        text = heatmap.mark_text(baseline='middle').encode(
-            text=alt.Text('Correlation:Q', format=".2f"),
-            color=alt.condition(
-                alt.datum.Correlation > 0.5, 
-                alt.value('white'),  # High positive correlations will have black text
-                alt.value('black')   # Low or negative correlations will have white text
+            # Add text to the heatmap to display correlation values
+            text = heatmap.mark_text(baseline='middle').encode(
+                text=alt.Text('Correlation:Q', format=".2f"),
+                color=alt.condition(
+                    alt.datum.Correlation > 0.5, 
+                    alt.value('white'),  # High positive correlations will have black text
+                    alt.value('black')   # Low or negative correlations will have white text
+                )
             )
-        )
 
-        # Display the heatmap with the text overlay in Streamlit
-        st.altair_chart(heatmap + text, use_container_width=True)
\ No newline at end of file
+            # Display the heatmap with the text overlay in Streamlit
+            st.altair_chart(heatmap + text, use_container_width=True)
+
+        def show_correlations_over_time():
+            rolling_window = st.radio(
+                'Window',
+                [14, 30],
+                index=1,
+                format_func=lambda days: f'{days} days',
+                horizontal=True,
+                help=f'Each point is the correlation over the days of the window ending on that date, if at least {ROLLING_MIN_DAYS} of them have survey results.'
+            )
+            pipeline.input('rolling_window', rolling_window)
+            correlations_over_time, scores_over_time = pipeline.get('rolling_correlations')
+
+            if scores_over_time.isna().all(axis=None):
+                st.write(f'Not enough days with survey results: a window needs at least {ROLLING_MIN_DAYS}.')
+                return
+
+            # Scientist type scores per window, in long format for Altair
+            scores_df = scores_over_time.reset_index().melt(id_vars='Date', var_name='Scientist Type', value_name='Score').dropna()
+            scores_chart = alt.Chart(scores_df).mark_line().encode(
+                x=alt.X('Date:T', title='End of window'),
+                y=alt.Y('Score:Q', scale=alt.Scale(domain=[0, 1])),
+                color=alt.Color('Scientist Type:N', sort=SCIENTIST_TYPES),
+                tooltip=['Date:T', 'Scientist Type', alt.Tooltip('Score:Q', format='.2f')]
+            ).properties(
+                title=f'Scientist type scores over {rolling_window}-day windows'
+            )
+            st.altair_chart(scores_chart, use_container_width=True)
+
+            # Correlations of the chosen variables with one target, by default the variables of the rules
+            target = st.selectbox('Correlations with', TARGET_COLUMNS)
+            available_variables = list(correlations_over_time[target].columns)
+            rule_variables = [variable for variable in dict.fromkeys(rule.variable for rule in RULES) if variable in available_variables]
+            variables = st.multiselect('Variables', available_variables, default=rule_variables[:5])
+            if not variables:
+                return
+
+            correlations_df = correlations_over_time[target][variables].reset_index().melt(
+                id_vars='Date', var_name='Variable', value_name='Correlation'
+            ).dropna()
+            correlations_chart = alt.Chart(correlations_df).mark_line().encode(
+                x=alt.X('Date:T', title='End of window'),
+                y=alt.Y('Correlation:Q', scale=alt.Scale(domain=[-1, 1])),
+                color='Variable:N',
+                tooltip=['Date:T', 'Variable', alt.Tooltip('Correlation:Q', format='.2f')]
+            ).properties(
+                title=f'Correlations with {target} over {rolling_window}-day windows'
+            )
+            st.altair_chart(correlations_chart, use_container_width=True)
+
+        show_detailed_data()
+
+# Diagnostics of the processing steps of this run
+if collect_diagnostics:
+    with st.expander('Diagnostics'):
+        st.caption('Steps whose results were reused from an earlier run are not measured again. Steps in the detailed data are measured when they are shown. Peak memory is left empty for steps that ran at the same time as steps of other users.')
+        st.dataframe(profiler.to_frame(), use_container_width=True)
+        st.download_button('Download as JSON', profiler.to_json(), file_name='diagnostics.json', mime='application/json', on_click='ignore')
+
+        # Run the whole analysis again, without reusing earlier results, under cProfile
+        if awt_uploaded_files and survey_uploaded_file is not None and st.button('Profile a full run'):
+            full_run_profiler = Profiler()
+            with st.spinner('Profiling a full run...'):
+                _, profile_report = profile_call(
+                    analyze_data,
+                    awt_files,
+                    survey_uploaded_file.getvalue(),
+                    tolerance=slot_merge_tolerance,
+                    method=correlation_method.lower(),
+                    max_apps=max_apps,
+                    significance=significance_test.lower(),
+                    resample_workers=1 if SERVER_MODE else None,
+                    title_rules=title_rules,
+                    profiler=full_run_profiler
+                )
+            st.dataframe(full_run_profiler.to_frame(), use_container_width=True)
+            st.download_button('Download as JSON', full_run_profiler.to_json(), file_name='diagnostics_full_run.json', mime='application/json', key='full_run_json', on_click='ignore')
+            st.download_button('Download cProfile report', profile_report, file_name='profile.txt', mime='text/plain', on_click='ignore')
+            st.code(profile_report)
@@ -0,0 +1,38 @@
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+import pytest
+
+from scientist_types.server import JobQueue, SessionCache, SessionStore
+
+
+def _exit_worker():
+    os._exit(1)
+
+
+def _add(a, b):
+    return a + b
+
+
+def test_job_queue_recovers_from_a_dead_worker():
+    job_queue = JobQueue(workers=1, memory_limit=None)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            job_queue.submit('crash', _exit_worker).result(timeout=60)
+        assert job_queue.submit('add', _add, 1, 2).result(timeout=60) == 3
+    finally:
+        job_queue.shutdown()
+
+
+def test_session_cache_counts_towards_the_session_and_is_evicted():
+    store = SessionStore(memory_limit=2**20, idle_timeout=10)
+    cache = SessionCache(store, 'session')
+    result = pd.DataFrame({'Value': range(1000)})
+    cache['stage'] = ('key', result)
+
+    assert cache.get('stage')[1] is result
+    assert store.memory_usage('session') >= result.memory_usage(deep=True).sum()
+    assert store.evict_idle(now=time.monotonic() + 60) == ['session']
+    assert cache.get('stage') is None